@@ -22,6 +22,18 @@ def create_app(config_name='development'):
     db.init_app(app)
     CORS(app)
 
+    from app.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    from app.compression import compression
+    compression.init_app(app)
+
+    from app.scryfall_service import scryfall_service
+    scryfall_service.init_app(app)
+
+    from app.jobs import job_runner
+    job_runner.init_app(app)
+
     # Register blueprints
     from app.routes import main_bp, api_bp
     app.register_blueprint(main_bp)
@@ -0,0 +1,285 @@
+"""
+Caching utilities.
+Provides a bounded in-memory LRU cache, a persistent SQLite cache and a
+two-tier cache combining them. Entries carry an optional TTL; expired
+entries are kept until evicted so they can be served when the origin fails.
+Also provides single-flight deduplication of identical in-flight calls.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Sentinel returned on cache misses (None is a valid cached value)
+MISSING = object()
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with optional per-entry TTL."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, allow_stale=False):
+        """Return the cached value for key, or MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            value, expires = entry
+            if not allow_stale and expires is not None and expires <= time.time():
+                self.misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entries if full."""
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+class SQLiteCache:
+    """Persistent JSON cache stored in a SQLite file, bounded by entry count."""
+
+    # Check the size bound every this many writes
+    EVICTION_INTERVAL = 100
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL, stored REAL NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS ix_cache_entries_stored ON cache_entries (stored)'
+            )
+        return self._conn
+
+    def get(self, key, allow_stale=False):
+        """Return the cached value for key, or MISSING."""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None or (not allow_stale and row[1] is not None and row[1] <= time.time()):
+                self.misses += 1
+                return MISSING
+
+            self.hits += 1
+            return json.loads(row[0])
+
+    def get_entry(self, key):
+        """Return (value, expires) for key regardless of expiry, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def set(self, key, value, ttl=None):
+        """Store a value, trimming the oldest entries when over the size bound."""
+        now = time.time()
+        expires = now + ttl if ttl else None
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache_entries (key, value, expires, stored) VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(value), expires, now)
+                )
+
+            self._writes += 1
+            if self._writes % self.EVICTION_INTERVAL == 0:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        count = conn.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            with conn:
+                conn.execute(
+                    'DELETE FROM cache_entries WHERE key IN '
+                    '(SELECT key FROM cache_entries ORDER BY stored LIMIT ?)',
+                    (excess,)
+                )
+            self.evictions += excess
+
+    def delete(self, key):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute('DELETE FROM cache_entries')
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+class TieredCache:
+    """Two-tier cache: an in-memory LRU in front of an optional SQLite tier."""
+
+    def __init__(self, memory_entries=256, disk_path=None, disk_entries=10000):
+        self.memory = LRUCache(memory_entries)
+        self.disk = SQLiteCache(disk_path, disk_entries) if disk_path else None
+        self.stale_served = 0
+
+    def get(self, key, allow_stale=False):
+        """Return the cached value for key from the fastest tier holding it, or MISSING."""
+        value = self.memory.get(key, allow_stale=allow_stale)
+        if value is not MISSING or self.disk is None:
+            if value is not MISSING and allow_stale:
+                self.stale_served += 1
+            return value
+
+        entry = self.disk.get_entry(key)
+        if entry is None:
+            self.disk.misses += 1
+            return MISSING
+
+        value, expires = entry
+        fresh = expires is None or expires > time.time()
+        if not fresh and not allow_stale:
+            self.disk.misses += 1
+            return MISSING
+
+        self.disk.hits += 1
+        if fresh:
+            # Promote to the memory tier for the remaining lifetime
+            self.memory.set(key, value, expires - time.time() if expires else None)
+        else:
+            self.stale_served += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        return {
+            'memory': self.memory.stats(),
+            'disk': self.disk.stats() if self.disk is not None else None,
+            'stale_served': self.stale_served
+        }
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls with the same key.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for and share its result (or exception).
+    """
+
+    class _Call:
+        __slots__ = ('event', 'result', 'error')
+
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers using key and return its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self):
+        return {
+            'in_flight': len(self._calls),
+            'executed': self.executed,
+            'shared': self.shared
+        }
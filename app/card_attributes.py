@@ -0,0 +1,87 @@
+"""
+Compact encodings of card attributes.
+Color identities are stored as 5-bit masks (W=1, U=2, B=4, R=8, G=16) so
+subset checks are a single bitwise test in Python or SQL, and card types
+as a bitfield so they are not re-parsed from the type line.
+"""
+
+from functools import lru_cache
+
+COLOR_BITS = {'W': 1, 'U': 2, 'B': 4, 'R': 8, 'G': 16}
+ALL_COLORS_MASK = 31
+
+@lru_cache(maxsize=1024)
+def color_mask(colors):
+    """
+    Encode colors as a bitmask.
+
+    Args:
+        colors: Comma-joined card colors ('W,U') or a deck code ('WU', 'C'
+                for colorless)
+
+    Returns:
+        Integer mask (0 for colorless)
+    """
+    if not colors:
+        return 0
+    mask = 0
+    for ch in colors:
+        mask |= COLOR_BITS.get(ch.upper(), 0)
+    return mask
+
+def mask_colors(mask):
+    """Decode a bitmask to its color letters in WUBRG order."""
+    return ''.join(c for c, bit in COLOR_BITS.items() if mask & bit)
+
+def fits_identity(card_mask, deck_mask):
+    """True if a card's color identity is within a deck's."""
+    return card_mask & ~deck_mask == 0
+
+@lru_cache(maxsize=64)
+def subset_masks(mask):
+    """
+    All masks whose colors are within mask, including colorless.
+
+    Used as ``column IN (...)`` so identity-within filters can use the index.
+    """
+    return tuple(m for m in range(ALL_COLORS_MASK + 1) if m & ~mask == 0)
+
+@lru_cache(maxsize=64)
+def superset_masks(mask):
+    """All masks containing every color in mask."""
+    return tuple(m for m in range(ALL_COLORS_MASK + 1) if m & mask == mask)
+
+def identity_mask(obj):
+    """
+    Color identity mask of a Card or Deck, computed from the string column
+    when the mask column has not been filled yet.
+    """
+    mask = obj.color_identity_mask
+    return color_mask(obj.color_identity) if mask is None else mask
+
+# Card type flags, parsed once from the type line at ingest
+TYPE_FLAGS = {
+    'creature': 1,
+    'instant': 2,
+    'sorcery': 4,
+    'artifact': 8,
+    'enchantment': 16,
+    'planeswalker': 32,
+    'land': 64,
+    'battle': 128,
+}
+
+def type_flags(type_line):
+    """
+    Encode the card types found in a type line as a bitfield.
+
+    Args:
+        type_line: Card type line (e.g. 'Legendary Artifact Creature — Golem')
+
+    Returns:
+        Integer with a TYPE_FLAGS bit set for every type present
+    """
+    if not type_line:
+        return 0
+    type_line = type_line.lower()
+    return sum(bit for name, bit in TYPE_FLAGS.items() if name in type_line)
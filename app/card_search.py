@@ -0,0 +1,303 @@
+"""
+Local card search engine.
+Parses the common subset of Scryfall search syntax into SQL over the cards table.
+"""
+
+import re
+from sqlalchemy import and_, or_, not_, func, true
+from app import db
+from app.models import Card
+from app.card_attributes import color_mask, subset_masks, superset_masks, ALL_COLORS_MASK
+
+class UnsupportedQueryError(ValueError):
+    """Raised when a query uses syntax the local engine cannot answer."""
+
+TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<lparen>\() |
+        (?P<rparen>\)) |
+        (?P<neg>-)(?=\S) |
+        !(?:"(?P<exact_quoted>[^"]*)"|(?P<exact>[^\s()]+)) |
+        (?P<key>[a-zA-Z]+)(?P<op>!=|<=|>=|:|=|<|>)(?:"(?P<value_quoted>[^"]*)"|(?P<value>[^\s()]+)) |
+        "(?P<word_quoted>[^"]*)" |
+        (?P<word>[^\s()"]+)
+    )''', re.VERBOSE)
+
+COLOR_ORDER = 'WUBRG'
+COLOR_NAMES = {
+    'white': 'W', 'blue': 'U', 'black': 'B', 'red': 'R', 'green': 'G',
+    'azorius': 'WU', 'orzhov': 'WB', 'boros': 'WR', 'selesnya': 'WG', 'dimir': 'UB',
+    'izzet': 'UR', 'simic': 'UG', 'rakdos': 'BR', 'golgari': 'BG', 'gruul': 'RG',
+    'esper': 'WUB', 'jeskai': 'WUR', 'bant': 'WUG', 'mardu': 'WBR', 'abzan': 'WBG',
+    'naya': 'WRG', 'grixis': 'UBR', 'sultai': 'UBG', 'temur': 'URG', 'jund': 'BRG'
+}
+RARITIES = ['common', 'uncommon', 'rare', 'mythic']
+RARITY_ALIASES = {'c': 'common', 'u': 'uncommon', 'r': 'rare', 'm': 'mythic'}
+
+COLOR_KEYS = {'c', 'color', 'colors'}
+IDENTITY_KEYS = {'id', 'identity', 'ci'}
+TYPE_KEYS = {'t', 'type'}
+ORACLE_KEYS = {'o', 'oracle'}
+CMC_KEYS = {'cmc', 'mv', 'manavalue'}
+RARITY_KEYS = {'r', 'rarity'}
+SET_KEYS = {'s', 'set', 'e', 'edition'}
+
+def _like_pattern(text):
+    """Build a case-insensitive substring LIKE pattern."""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+def _contains(column, text):
+    return column.ilike(_like_pattern(text), escape='\\')
+
+def _parse_colors(value):
+    """Convert a color value (letters or a guild/shard name) to a set of color letters."""
+    value = value.lower()
+    if value in COLOR_NAMES:
+        return set(COLOR_NAMES[value])
+    if value in ('c', 'colorless'):
+        return set()
+    if all(ch in 'wubrg' for ch in value):
+        return set(value.upper())
+    raise UnsupportedQueryError(f'Unsupported color value: {value}')
+
+def _color_filter(column, op, value):
+    """Build a filter comparing a comma-joined color column against a color set."""
+    if value.lower() in ('m', 'multicolor'):
+        if op not in (':', '>='):
+            raise UnsupportedQueryError('Multicolor only supports ":"')
+        return column.like('%,%')
+
+    colors = _parse_colors(value)
+    column = func.coalesce(column, '')
+    has_all = and_(true(), *[column.like(f'%{c}%') for c in colors])
+    only_these = and_(true(), *[not_(column.like(f'%{c}%')) for c in COLOR_ORDER if c not in colors])
+    exact = and_(has_all, only_these)
+
+    # For colors ":" means "includes", except that colorless means exactly colorless
+    if op in (':', '>=') and not colors:
+        op = '='
+    if op == ':':
+        op = '>='
+    if op == '=':
+        return exact
+    if op == '!=':
+        return not_(exact)
+    if op == '>=':
+        return has_all
+    if op == '<=':
+        return only_these
+    if op == '>':
+        return and_(has_all, not_(only_these))
+    if op == '<':
+        return and_(only_these, not_(has_all))
+    raise UnsupportedQueryError(f'Unsupported color operator: {op}')
+
+def _identity_filter(op, value):
+    """Build a filter over the color identity bitmask, as index-friendly IN lists."""
+    column = Card.color_identity_mask
+    if value.lower() in ('m', 'multicolor'):
+        if op not in (':', '>='):
+            raise UnsupportedQueryError('Multicolor only supports ":"')
+        return column.in_([m for m in range(ALL_COLORS_MASK + 1) if bin(m).count('1') > 1])
+
+    mask = color_mask(''.join(_parse_colors(value)))
+
+    # ":" means "fits within" for color identity
+    if op in (':', '<='):
+        return column.in_(subset_masks(mask))
+    if op == '=':
+        return column == mask
+    if op == '!=':
+        return column != mask
+    if op == '>=':
+        return column.in_(superset_masks(mask))
+    if op == '>':
+        return column.in_([m for m in superset_masks(mask) if m != mask])
+    if op == '<':
+        return column.in_([m for m in subset_masks(mask) if m != mask])
+    raise UnsupportedQueryError(f'Unsupported color operator: {op}')
+
+def _compare(column, op, value):
+    if op in (':', '='):
+        return column == value
+    if op == '!=':
+        return column != value
+    if op == '<':
+        return column < value
+    if op == '<=':
+        return column <= value
+    if op == '>':
+        return column > value
+    return column >= value
+
+def _rarity_filter(op, value):
+    rarity = RARITY_ALIASES.get(value.lower(), value.lower())
+    if rarity not in RARITIES:
+        raise UnsupportedQueryError(f'Unsupported rarity: {value}')
+
+    rank = RARITIES.index(rarity)
+    matching = [r for i, r in enumerate(RARITIES) if _compare(i, op, rank)]
+    return Card.rarity.in_(matching)
+
+def _keyword_filter(key, op, value):
+    """Translate a single ``key op value`` term into a SQL expression."""
+    key = key.lower()
+
+    if key in COLOR_KEYS:
+        return _color_filter(Card.colors, op, value)
+    if key in IDENTITY_KEYS:
+        return _identity_filter(op, value)
+    if key in TYPE_KEYS and op == ':':
+        return _contains(Card.type_line, value)
+    if key in ORACLE_KEYS and op == ':':
+        return _contains(Card.oracle_text, value)
+    if key in CMC_KEYS:
+        try:
+            return _compare(Card.cmc, op, float(value))
+        except ValueError:
+            raise UnsupportedQueryError(f'Unsupported mana value: {value}')
+    if key in RARITY_KEYS:
+        return _rarity_filter(op, value)
+    if key in SET_KEYS and op == ':':
+        return Card.set_code == value.lower()
+    if key == 'is' and op == ':' and value.lower() == 'commander':
+        return Card.is_legal_commander.is_(True)
+
+    raise UnsupportedQueryError(f'Unsupported search term: {key}{op}{value}')
+
+class QueryParser:
+    """
+    Recursive descent parser for Scryfall-style queries.
+
+    Grammar:
+        expr  := and_expr ('or' and_expr)*
+        and_expr := unary (['and'] unary)*
+        unary := '-' unary | '(' expr ')' | term
+    """
+
+    def __init__(self, query):
+        self.tokens = self._tokenize(query)
+        self.pos = 0
+
+    def _tokenize(self, query):
+        tokens = []
+        pos = 0
+        query = query.strip()
+        while pos < len(query):
+            match = TOKEN_RE.match(query, pos)
+            if not match or match.end() == pos:
+                raise UnsupportedQueryError(f'Cannot parse query near: {query[pos:]}')
+            pos = match.end()
+            tokens.append(match)
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _is_word(self, token, word):
+        return token is not None and (token.group('word') or '').lower() == word
+
+    def parse(self):
+        if not self.tokens:
+            raise UnsupportedQueryError('Empty query')
+        expr = self._parse_or()
+        if self._peek() is not None:
+            raise UnsupportedQueryError('Unbalanced parentheses')
+        return expr
+
+    def _parse_or(self):
+        clauses = [self._parse_and()]
+        while self._is_word(self._peek(), 'or'):
+            self.pos += 1
+            clauses.append(self._parse_and())
+        return clauses[0] if len(clauses) == 1 else or_(*clauses)
+
+    def _parse_and(self):
+        clauses = [self._parse_unary()]
+        while True:
+            token = self._peek()
+            if token is None or token.group('rparen') or self._is_word(token, 'or'):
+                break
+            if self._is_word(token, 'and'):
+                self.pos += 1
+            clauses.append(self._parse_unary())
+        return clauses[0] if len(clauses) == 1 else and_(*clauses)
+
+    def _parse_unary(self):
+        token = self._peek()
+        if token is None:
+            raise UnsupportedQueryError('Unexpected end of query')
+        self.pos += 1
+
+        if token.group('neg'):
+            return not_(self._parse_unary())
+        if token.group('lparen'):
+            expr = self._parse_or()
+            closing = self._peek()
+            if closing is None or not closing.group('rparen'):
+                raise UnsupportedQueryError('Unbalanced parentheses')
+            self.pos += 1
+            return expr
+        if token.group('rparen'):
+            raise UnsupportedQueryError('Unbalanced parentheses')
+        return self._term(token)
+
+    def _term(self, token):
+        if token.group('key'):
+            value = token.group('value_quoted')
+            if value is None:
+                value = token.group('value')
+            return _keyword_filter(token.group('key'), token.group('op'), value)
+
+        exact = token.group('exact_quoted')
+        if exact is None:
+            exact = token.group('exact')
+        if exact is not None:
+            return func.lower(Card.name) == exact.lower()
+
+        word = token.group('word_quoted')
+        if word is None:
+            word = token.group('word')
+        return _contains(Card.name, word)
+
+def search_local_cards(query, page=1, per_page=50, identity_mask=None):
+    """
+    Search the local cards table using Scryfall syntax.
+
+    Args:
+        query: Scryfall search query
+        page: Page number for pagination (1-based)
+        per_page: Number of cards per page
+        identity_mask: Only return cards within this color identity mask
+                       (e.g. a deck's legal pool)
+
+    Returns:
+        Dictionary with the same shape as the /api/cards/search response
+
+    Raises:
+        UnsupportedQueryError: If the query uses syntax the local engine cannot handle
+    """
+    criteria = QueryParser(query).parse()
+    if identity_mask is not None:
+        criteria = and_(criteria, Card.color_identity_mask.in_(subset_masks(identity_mask)))
+    page = max(page, 1)
+
+    total = db.session.query(func.count(func.distinct(Card.name))).filter(criteria).scalar()
+
+    # One row per card name, since the table may hold several printings
+    cards = (
+        Card.query
+        .filter(criteria)
+        .group_by(Card.name)
+        .order_by(Card.name)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+        .all()
+    )
+
+    return {
+        'cards': [card.to_dict() for card in cards],
+        'has_more': page * per_page < total,
+        'total_cards': total
+    }
@@ -0,0 +1,120 @@
+"""
+Cross-deck card usage index.
+Maintains the card_usage table (card name -> owning deck) alongside every
+deck card insert and delete, so the "no card in two decks" rule is
+enforced when cards are added instead of discovered afterwards.
+"""
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Card, CardUsage, DeckCard
+
+class CardConflictError(Exception):
+    """Raised when a card is already used by another deck."""
+
+    def __init__(self, card_name, deck_id):
+        self.card_name = card_name
+        self.deck_id = deck_id
+        super().__init__(f"{card_name} is already used in another deck")
+
+def is_tracked(card_name):
+    """Basic lands may appear in every deck and are not tracked."""
+    return card_name not in current_app.config['BASIC_LANDS']
+
+def claim_cards(deck_id, card_names):
+    """
+    Record that a deck uses several cards, with one lookup query.
+
+    Args:
+        deck_id: ID of the deck adding the cards
+        card_names: Names of the cards being added
+
+    Raises:
+        CardConflictError: For the first card another deck already uses. If
+                           another transaction claims a card between the
+                           lookup and the insert, the session is rolled back
+                           before raising.
+    """
+    names = {name for name in card_names if is_tracked(name)}
+    if not names:
+        return
+
+    owners = dict(
+        db.session.query(CardUsage.card_name, CardUsage.deck_id)
+        .filter(CardUsage.card_name.in_(names))
+    )
+    for name in sorted(names):
+        owner = owners.get(name)
+        if owner is None:
+            db.session.add(CardUsage(card_name=name, deck_id=deck_id))
+        elif owner != deck_id:
+            raise CardConflictError(name, owner)
+
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # Claimed concurrently by another deck since the lookup
+        db.session.rollback()
+        conflicts = find_conflicts(deck_id, names)
+        name = min(conflicts) if conflicts else min(names)
+        raise CardConflictError(name, conflicts.get(name))
+
+def find_conflicts(deck_id, card_names):
+    """
+    Look up which of several cards are already used by other decks, in one query.
+
+    Args:
+        deck_id: ID of the deck that would add the cards
+        card_names: Names of the cards to check
+
+    Returns:
+        Dictionary mapping each conflicting card name to the owning deck ID
+    """
+    names = {name for name in card_names if is_tracked(name)}
+    if not names:
+        return {}
+
+    return dict(
+        db.session.query(CardUsage.card_name, CardUsage.deck_id)
+        .filter(CardUsage.card_name.in_(names), CardUsage.deck_id != deck_id)
+    )
+
+def release_cards(deck_id, card_names):
+    """
+    Release a deck's claims on cards it no longer contains.
+    The caller must know that no printing of these cards remains in the deck.
+    """
+    names = [name for name in card_names if is_tracked(name)]
+    if names:
+        CardUsage.query.filter(
+            CardUsage.deck_id == deck_id, CardUsage.card_name.in_(names)
+        ).delete(synchronize_session=False)
+
+def release_deck(deck_id):
+    """Release every card claimed by a deck (used when the deck is deleted)."""
+    CardUsage.query.filter_by(deck_id=deck_id).delete()
+
+def rebuild_card_usage():
+    """
+    Rebuild the index from the deck_cards table.
+
+    When a card is already used by several decks (data from before the index
+    existed), the deck with the lowest ID keeps the claim.
+
+    Returns:
+        Number of card names indexed
+    """
+    basic_lands = current_app.config['BASIC_LANDS']
+    CardUsage.query.delete()
+
+    owners = (
+        db.session.query(Card.name, func.min(DeckCard.deck_id))
+        .join(DeckCard, DeckCard.card_id == Card.id)
+        .filter(Card.name.notin_(basic_lands))
+        .group_by(Card.name)
+        .all()
+    )
+    db.session.add_all(CardUsage(card_name=name, deck_id=deck_id) for name, deck_id in owners)
+    return len(owners)
@@ -3,8 +3,10 @@
 """
 
 from flask import current_app
-from app.models import Deck, DeckCard
+from sqlalchemy import String, column, values, func
+from app.models import Deck, DeckCard, Card
 from app import db
+from app.read_models import deck_summaries
 
 class ChallengeValidator:
     """Validates the 32 deck challenge rules."""
@@ -16,41 +18,55 @@ class ChallengeValidator:
         Returns:
             Dictionary with challenge status and validation results
         """
-        decks = Deck.query.all()
-
-        # Check 32 deck requirement
         color_combos = current_app.config['COLOR_COMBINATIONS']
-        deck_colors = {d.color_identity for d in decks}
-        missing = set(color_combos.keys()) - deck_colors
-
-        # Check card uniqueness across decks
-        card_usage = {}
         basic_lands = current_app.config['BASIC_LANDS']
 
-        for deck in decks:
-            for dc in deck.cards:
-                if dc.card and dc.card.name not in basic_lands:
-                    if dc.card.name not in card_usage:
-                        card_usage[dc.card.name] = []
-                    card_usage[dc.card.name].append({
-                        'deck_id': deck.id,
-                        'deck_name': deck.name,
-                        'color_identity': deck.color_identity
-                    })
-
-        # Find cards used in multiple decks
-        duplicates = {
-            name: decks_list for name, decks_list in card_usage.items()
-            if len(decks_list) > 1
-        }
+        total_decks = db.session.query(func.count(Deck.id)).scalar()
+
+        # Check 32 deck requirement: anti-join the configured combinations against decks
+        combos = values(column('code', String), name='combos').data([(code,) for code in color_combos]).cte()
+        missing = [
+            code for (code,) in
+            db.session.query(combos.c.code)
+            .outerjoin(Deck, Deck.color_identity == combos.c.code)
+            .filter(Deck.id.is_(None))
+            .order_by(combos.c.code)
+        ]
+
+        # Check card uniqueness across decks: names used by more than one deck
+        duplicate_names = (
+            db.session.query(Card.name)
+            .join(DeckCard, DeckCard.card_id == Card.id)
+            .filter(Card.name.notin_(basic_lands))
+            .group_by(Card.name)
+            .having(func.count(func.distinct(DeckCard.deck_id)) > 1)
+        )
+
+        # Only the offending (card, deck) rows are loaded
+        duplicate_rows = (
+            db.session.query(Card.name, Deck.id, Deck.name, Deck.color_identity)
+            .join(DeckCard, DeckCard.card_id == Card.id)
+            .join(Deck, Deck.id == DeckCard.deck_id)
+            .filter(Card.name.in_(duplicate_names.scalar_subquery()))
+            .distinct()
+            .order_by(Card.name, Deck.id)
+        )
+
+        duplicates = {}
+        for card_name, deck_id, deck_name, color_identity in duplicate_rows:
+            duplicates.setdefault(card_name, []).append({
+                'deck_id': deck_id,
+                'deck_name': deck_name,
+                'color_identity': color_identity
+            })
 
         return {
             'complete': len(missing) == 0,
-            'total_decks': len(decks),
-            'progress': f"{len(decks)}/32",
+            'total_decks': total_decks,
+            'progress': f"{total_decks}/32",
             'missing_colors': [
                 {'code': code, 'name': color_combos[code]}
-                for code in sorted(missing)
+                for code in missing
             ],
             'duplicate_cards': duplicates,
             'duplicate_count': len(duplicates),
@@ -64,17 +80,20 @@ class ChallengeValidator:
         Returns:
             Dictionary mapping color codes to deck info
         """
-        decks = Deck.query.all()
         color_combos = current_app.config['COLOR_COMBINATIONS']
 
+        decks_by_color = {}
+        for deck in deck_summaries():
+            decks_by_color.setdefault(deck.color_identity, (deck.id, deck.name))
+
         progress = {}
         for code, name in color_combos.items():
-            deck = next((d for d in decks if d.color_identity == code), None)
+            deck_id, deck_name = decks_by_color.get(code, (None, None))
             progress[code] = {
                 'name': name,
-                'completed': deck is not None,
-                'deck_id': deck.id if deck else None,
-                'deck_name': deck.name if deck else None
+                'completed': deck_id is not None,
+                'deck_id': deck_id,
+                'deck_name': deck_name
             }
 
         return progress
@@ -0,0 +1,83 @@
+"""
+Response compression.
+Compresses JSON, text and XML responses above a size threshold with brotli
+(when installed) or gzip, according to the client's Accept-Encoding. Strong
+ETags get an encoding suffix so each encoding is cached as its own variant.
+"""
+
+import gzip
+from flask import request
+from app.etags import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+def _gzip(data, level):
+    return gzip.compress(data, compresslevel=level)
+
+def _brotli(data, level):
+    # Brotli quality runs 0-11
+    return brotli.compress(data, quality=min(level, 11))
+
+class Compression:
+    """after_request hook compressing eligible responses."""
+
+    def __init__(self):
+        self.min_size = 1024
+        self.level = 6
+        self.mimetypes = ()
+
+    def init_app(self, app):
+        """Configure from the Flask app config and register the hook."""
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', self.min_size)
+        self.level = app.config.get('COMPRESS_LEVEL', self.level)
+        self.mimetypes = tuple(app.config.get('COMPRESS_MIMETYPES', self.mimetypes))
+        app.after_request(self.compress_response)
+
+    def encoders(self):
+        """Available encodings, most preferred first."""
+        encoders = [('gzip', _gzip)]
+        if brotli is not None:
+            encoders.insert(0, ('br', _brotli))
+        return encoders
+
+    def choose_encoding(self):
+        """Best encoding accepted by the client, as (name, encoder), or None."""
+        accepted = request.accept_encodings
+        best = None
+        for name, encoder in self.encoders():
+            quality = accepted[name]
+            if quality > 0 and (best is None or quality > best[0]):
+                best = (quality, name, encoder)
+        return best[1:] if best else None
+
+    def compress_response(self, response):
+        if response.mimetype not in self.mimetypes:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if (response.status_code != 200 or response.direct_passthrough
+                or response.is_streamed or 'Content-Encoding' in response.headers):
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        chosen = self.choose_encoding()
+        if chosen is None:
+            return response
+        name, encoder = chosen
+
+        response.set_data(encoder(data, self.level))
+        response.headers['Content-Encoding'] = name
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(encoded_etag(etag, name))
+        return response
+
+# Create a singleton instance
+compression = Compression()
@@ -2,82 +2,174 @@
 Database utilities and helper functions.
 """
 
+from flask import current_app
+from sqlalchemy import Integer, and_, case, cast, func, not_, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app import db
-from app.models import Deck, Card, DeckCard
+from app.models import Deck, Card, DeckCard, Printing, BulkImport, deck_version
+from app.name_index import card_name_index
+from app.cache import LRUCache, MISSING
+from app.card_attributes import TYPE_FLAGS
 
 def reset_database():
     """Drop all tables and recreate them. WARNING: Destroys all data!"""
     db.drop_all()
     db.create_all()
 
+def _upsert_rows(model, rows, compare_columns=None):
+    """
+    Insert or update rows of a model keyed by its primary key.
+
+    Runs one INSERT ... ON CONFLICT DO UPDATE statement for all rows
+    (executemany). Existing rows are only rewritten when one of
+    compare_columns (default: all non-key columns) actually changed.
+    """
+    table = model.__table__
+    stmt = sqlite_insert(table)
+    update_columns = [col.name for col in table.columns if col.name != 'id']
+    compare_columns = compare_columns or update_columns
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={name: stmt.excluded[name] for name in update_columns},
+        where=or_(*[table.c[name].is_distinct_from(stmt.excluded[name]) for name in compare_columns])
+    )
+    db.session.execute(stmt, rows)
+
+def upsert_cards(cards):
+    """
+    Insert or update parsed card rows in a single statement, skipping unchanged rows.
+
+    Shared by search, card lookup, decklist import and bulk-data ingest.
+
+    Args:
+        cards: List of dictionaries as returned by ScryfallService.parse_card_data
+
+    Returns:
+        Number of rows written
+    """
+    if not cards:
+        return 0
+
+    _upsert_rows(Card, cards)
+    card_name_index.add(card['name'] for card in cards)
+    return len(cards)
+
+def bulk_data_loaded():
+    """
+    Whether a Scryfall bulk-data import has completed, i.e. whether the cards
+    table holds the whole card pool rather than only cards fetched so far.
+
+    Only a positive answer is memoized on the app: an import running in
+    another process is picked up by the next call.
+    """
+    if current_app.extensions.get('bulk_data_loaded'):
+        return True
+
+    loaded = db.session.query(BulkImport.id).first() is not None
+    current_app.extensions['bulk_data_loaded'] = loaded
+    return loaded
+
+def upsert_printings(printings, fetched_at):
+    """
+    Insert or update printing rows in a single statement.
+
+    Args:
+        printings: List of dictionaries as returned by ScryfallService.parse_printing_data
+        fetched_at: Time the printings were fetched from Scryfall
+
+    Returns:
+        Number of rows written
+    """
+    rows = [dict(p, fetched_at=fetched_at) for p in printings if p.get('id')]
+    if rows:
+        # Always rewrite so fetched_at records the refresh
+        _upsert_rows(Printing, rows, compare_columns=['fetched_at'])
+    return len(rows)
+
+# Deck statistics keyed by deck_version (deck id, creation time, revision)
+deck_stats_cache = LRUCache(max_entries=512)
+
+STAT_TYPES = {
+    'creatures': 'creature',
+    'instants': 'instant',
+    'sorceries': 'sorcery',
+    'artifacts': 'artifact',
+    'enchantments': 'enchantment',
+    'planeswalkers': 'planeswalker',
+    'lands': 'land',
+}
+STAT_COLORS = 'WUBRG'
+MANA_CURVE_MAX = 7  # Mana values of 7 and up share one bucket
+
 def get_deck_stats(deck_id):
     """
-    Get statistics for a deck.
+    Get statistics for a deck with one aggregate query.
+
+    Type counts come from the cards' type_flags bitfield; the average CMC
+    and mana curve exclude lands.
 
     Args:
         deck_id: ID of the deck
 
     Returns:
-        Dictionary with deck statistics
+        Dictionary with deck statistics, or None if the deck doesn't exist
     """
-    deck = Deck.query.get(deck_id)
-    if not deck:
+    def total(condition=None):
+        if condition is None:
+            condition = Card.id.isnot(None)
+        return func.coalesce(func.sum(case((condition, DeckCard.quantity), else_=0)), 0)
+
+    def has_type(name):
+        return Card.type_flags.op('&')(TYPE_FLAGS[name]) != 0
+
+    spell = and_(Card.id.isnot(None), not_(has_type('land')), Card.cmc.isnot(None))
+    curve_bucket = func.min(cast(Card.cmc, Integer), MANA_CURVE_MAX)
+
+    columns = [total().label('total_cards')]
+    columns += [total(has_type(flag)).label(key) for key, flag in STAT_TYPES.items()]
+    columns += [
+        func.sum(case((spell, Card.cmc * DeckCard.quantity))).label('cmc_sum'),
+        total(spell).label('spell_count'),
+    ]
+    columns += [total(and_(spell, curve_bucket == n)).label(f'curve_{n}') for n in range(MANA_CURVE_MAX + 1)]
+    columns += [total(func.instr(Card.colors, color) > 0).label(f'color_{color}') for color in STAT_COLORS]
+    columns.append(total(and_(Card.id.isnot(None), func.coalesce(Card.colors, '') == '')).label('color_C'))
+
+    row = (
+        db.session.query(*columns)
+        .select_from(Deck)
+        .outerjoin(DeckCard, DeckCard.deck_id == Deck.id)
+        .outerjoin(Card, Card.id == DeckCard.card_id)
+        .filter(Deck.id == deck_id)
+        .group_by(Deck.id)
+        .first()
+    )
+    if row is None:
         return None
 
-    stats = {
-        'total_cards': 0,
-        'creatures': 0,
-        'instants': 0,
-        'sorceries': 0,
-        'artifacts': 0,
-        'enchantments': 0,
-        'planeswalkers': 0,
-        'lands': 0,
-        'avg_cmc': 0,
-        'color_distribution': {'W': 0, 'U': 0, 'B': 0, 'R': 0, 'G': 0, 'C': 0}
+    stats = {'total_cards': row.total_cards}
+    stats.update({key: getattr(row, key) for key in STAT_TYPES})
+    stats['avg_cmc'] = round(row.cmc_sum / row.spell_count, 2) if row.spell_count else 0
+    stats['mana_curve'] = {
+        (f'{n}+' if n == MANA_CURVE_MAX else str(n)): getattr(row, f'curve_{n}')
+        for n in range(MANA_CURVE_MAX + 1)
     }
+    stats['color_distribution'] = {color: getattr(row, f'color_{color}') for color in STAT_COLORS + 'C'}
+    return stats
+
+def get_deck_stats_cached(deck):
+    """
+    Get a deck's statistics, memoized per deck_version (ID, creation time and revision).
 
-    total_cmc = 0
-    non_land_count = 0
-
-    for dc in deck.cards:
-        if not dc.card:
-            continue
-
-        stats['total_cards'] += dc.quantity
-        type_line = dc.card.type_line.lower()
-
-        # Count by type
-        if 'creature' in type_line:
-            stats['creatures'] += dc.quantity
-        if 'instant' in type_line:
-            stats['instants'] += dc.quantity
-        if 'sorcery' in type_line:
-            stats['sorceries'] += dc.quantity
-        if 'artifact' in type_line:
-            stats['artifacts'] += dc.quantity
-        if 'enchantment' in type_line:
-            stats['enchantments'] += dc.quantity
-        if 'planeswalker' in type_line:
-            stats['planeswalkers'] += dc.quantity
-        if 'land' in type_line:
-            stats['lands'] += dc.quantity
-
-        # Calculate average CMC (exclude lands)
-        if 'land' not in type_line and dc.card.cmc is not None:
-            total_cmc += dc.card.cmc * dc.quantity
-            non_land_count += dc.quantity
-
-        # Color distribution
-        if dc.card.colors:
-            for color in dc.card.colors.split(','):
-                if color in stats['color_distribution']:
-                    stats['color_distribution'][color] += dc.quantity
-        else:
-            stats['color_distribution']['C'] += dc.quantity
-
-    # Calculate average CMC
-    if non_land_count > 0:
-        stats['avg_cmc'] = round(total_cmc / non_land_count, 2)
+    Args:
+        deck: Deck model instance
 
+    Returns:
+        Dictionary with deck statistics
+    """
+    key = deck_version(deck)
+    stats = deck_stats_cache.get(key)
+    if stats is MISSING:
+        stats = get_deck_stats(deck.id)
+        deck_stats_cache.set(key, stats)
     return stats
@@ -0,0 +1,297 @@
+"""
+Deck card editing.
+Applies add, update and remove operations to one deck in a single
+transaction: single edits read only the deck card they touch, batches read
+the deck's cards and every referenced card up front, card usage claims are
+checked in one query, and the deck revision, incremental validation state
+and database are updated once on commit.
+"""
+
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import Deck, Card, DeckCard
+from app.card_usage import claim_cards, release_cards, CardConflictError
+from app.incremental_validator import incremental_validator
+
+# Deck card fields a client may set when adding or updating a card
+EDITABLE_FIELDS = (
+    'quantity', 'category', 'selected_printing_id', 'selected_image_url',
+    'selected_set_code', 'selected_collector_number'
+)
+
+class DeckEditError(Exception):
+    """An operation that cannot be applied; carries the HTTP status to respond with."""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.extra = extra
+
+    def to_dict(self):
+        return {'error': self.message, **self.extra}
+
+def check_quantity(value):
+    """
+    Validate a deck card quantity.
+
+    Raises:
+        DeckEditError: Unless value is a positive integer
+    """
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise DeckEditError('quantity must be a positive integer')
+    return value
+
+class DeckEditor:
+    """Collects deck card edits for one deck and commits them together."""
+
+    def __init__(self, deck, preload=False):
+        """
+        Args:
+            deck: Deck to edit
+            preload: Read all of the deck's cards up front (for batches and
+                     imports); otherwise each edit reads only the deck card
+                     it touches
+        """
+        self.deck = deck
+        self.old_revision = deck.revision
+        self.deck_cards = {}  # card ID -> DeckCard (None when known not to be in the deck)
+        self.cards = {}
+        self.preloaded = False
+        self._has_commander = None
+        self._added_by = {}  # card name -> index of the operation that added it
+        self._removed_names = set()
+        self._deltas = []  # (kind, deck card, value) for the incremental validator
+        self._index = None
+        if preload:
+            self.load_deck_cards()
+
+    @property
+    def has_changes(self):
+        """True once a card has been added, removed or had its quantity changed."""
+        return bool(self._deltas)
+
+    def load_deck_cards(self):
+        """Read all of the deck's cards with their card data in one query."""
+        self.deck_cards = {
+            dc.card_id: dc
+            for dc in DeckCard.query.options(joinedload(DeckCard.card)).filter_by(deck_id=self.deck.id)
+        }
+        self.cards.update((dc.card_id, dc.card) for dc in self.deck_cards.values() if dc.card)
+        self.preloaded = True
+
+    def _find_deck_card(self, card_id):
+        """The deck's card for a card ID (one indexed lookup unless preloaded), or None."""
+        if card_id not in self.deck_cards and not self.preloaded:
+            deck_card = (
+                DeckCard.query.options(joinedload(DeckCard.card))
+                .filter_by(deck_id=self.deck.id, card_id=card_id)
+                .first()
+            )
+            self.deck_cards[card_id] = deck_card
+            if deck_card is not None and deck_card.card:
+                self.cards[card_id] = deck_card.card
+        return self.deck_cards.get(card_id)
+
+    def _deck_has_commander(self):
+        if self._has_commander is None:
+            if self.preloaded:
+                self._has_commander = any(dc and dc.is_commander for dc in self.deck_cards.values())
+            else:
+                self._has_commander = db.session.query(
+                    DeckCard.query.filter_by(deck_id=self.deck.id, is_commander=True).exists()
+                ).scalar()
+        return self._has_commander
+
+    def load_cards(self, card_ids):
+        """Read every card referenced by upcoming add operations in one query."""
+        missing = {card_id for card_id in card_ids if card_id and card_id not in self.cards}
+        if missing:
+            for card in Card.query.filter(Card.id.in_(missing)):
+                self.cards[card.id] = card
+
+    def _get_deck_card(self, card_id):
+        deck_card = self._find_deck_card(card_id)
+        if deck_card is None:
+            raise DeckEditError('Card not in deck', 404)
+        return deck_card
+
+    def add(self, data):
+        """
+        Add a card to the deck with optional print selection.
+
+        Args:
+            data: Dictionary with card_id and optional quantity, is_commander,
+                  category and selected_* print fields
+
+        Returns:
+            The new DeckCard
+        """
+        card_id = data.get('card_id')
+        if not card_id:
+            raise DeckEditError('card_id required')
+        quantity = check_quantity(data.get('quantity', 1))
+
+        self.load_cards([card_id])
+        card = self.cards.get(card_id)
+        if not card:
+            raise DeckEditError('Card not found', 404)
+
+        if self._find_deck_card(card_id) is not None:
+            raise DeckEditError('Card already in deck')
+
+        # Determine if this should be the commander
+        is_commander = data.get('is_commander', False)
+        if not is_commander and card.is_legal_commander:
+            # Check if deck doesn't have a commander yet
+            if not self._deck_has_commander():
+                is_commander = True
+
+        deck_card = DeckCard(
+            deck_id=self.deck.id,
+            card_id=card_id,
+            quantity=quantity,
+            is_commander=is_commander,
+            category=data.get('category'),
+            selected_printing_id=data.get('selected_printing_id', card_id),
+            selected_image_url=data.get('selected_image_url', card.image_url),
+            selected_set_code=data.get('selected_set_code', card.set_code),
+            selected_collector_number=data.get('selected_collector_number', card.collector_number)
+        )
+
+        # Update deck commander info if this is the commander
+        if is_commander:
+            self.deck.commander_id = card_id
+            self.deck.commander_name = card.name
+            self._has_commander = True
+
+        db.session.add(deck_card)
+        self.deck_cards[card_id] = deck_card
+        self._added_by.setdefault(card.name, self._index)
+        self._deltas.append(('add', deck_card, card))
+        return deck_card
+
+    def update(self, card_id, data):
+        """
+        Update a card's quantity, category or print selection.
+
+        Returns:
+            The updated DeckCard
+        """
+        deck_card = self._get_deck_card(card_id)
+        if 'quantity' in data:
+            check_quantity(data['quantity'])
+
+        for field in EDITABLE_FIELDS:
+            if field in data:
+                setattr(deck_card, field, data[field])
+
+        if 'quantity' in data:
+            self._deltas.append(('quantity', deck_card, deck_card.quantity))
+        return deck_card
+
+    def remove(self, card_id):
+        """Remove a card from the deck."""
+        deck_card = self._get_deck_card(card_id)
+
+        # If removing commander, clear deck commander info
+        if deck_card.is_commander:
+            self.deck.commander_id = None
+            self.deck.commander_name = None
+            self._has_commander = None if not self.preloaded else False
+
+        self.deck_cards[card_id] = None
+        if deck_card in db.session.new:
+            # Added earlier in this batch: just don't insert it
+            db.session.expunge(deck_card)
+            self._deltas = [delta for delta in self._deltas if delta[1] is not deck_card]
+            return
+
+        db.session.delete(deck_card)
+        if deck_card.card:
+            self._removed_names.add(deck_card.card.name)
+        self._deltas.append(('remove', deck_card, deck_card.id))
+
+    def apply(self, operations):
+        """
+        Apply a list of operations in order.
+
+        Each operation is a dictionary with 'op' ('add', 'update' or 'remove'),
+        'card_id' and, for add and update, the fields to set.
+
+        Raises:
+            DeckEditError: For the first operation that cannot be applied,
+                           with its index in the 'operation' field
+        """
+        self.load_cards(op.get('card_id') for op in operations
+                        if isinstance(op, dict) and op.get('op') == 'add')
+
+        for index, operation in enumerate(operations):
+            self._index = index
+            try:
+                if not isinstance(operation, dict):
+                    raise DeckEditError('Operation must be an object')
+                op = operation.get('op')
+                if op == 'add':
+                    self.add(operation)
+                elif op == 'update':
+                    self.update(operation.get('card_id'), operation)
+                elif op == 'remove':
+                    self.remove(operation.get('card_id'))
+                else:
+                    raise DeckEditError(f'Unknown operation: {op}')
+            except DeckEditError as e:
+                e.extra['operation'] = index
+                raise
+        self._index = None
+
+    def _released_names(self, added_names):
+        """Names of removed cards with no other printing left in the deck."""
+        names = self._removed_names - added_names
+        if not names:
+            return set()
+
+        removed_ids = [deck_card.id for kind, deck_card, _ in self._deltas if kind == 'remove']
+        remaining = (
+            db.session.query(Card.name)
+            .join(DeckCard, DeckCard.card_id == Card.id)
+            .filter(DeckCard.deck_id == self.deck.id, Card.name.in_(names),
+                    DeckCard.id.notin_(removed_ids))
+        )
+        return names - {name for (name,) in remaining}
+
+    def commit(self):
+        """
+        Claim and release card usage, bump the deck revision and commit.
+
+        Raises:
+            DeckEditError: With status 409 if an added card is used by another deck
+        """
+        added_names = {value.name for kind, _, value in self._deltas if kind == 'add'}
+        try:
+            claim_cards(self.deck.id, added_names)
+        except CardConflictError as e:
+            owner = db.session.get(Deck, e.deck_id) if e.deck_id is not None else None
+            extra = {'conflict_deck_id': e.deck_id}
+            if self._added_by.get(e.card_name) is not None:
+                extra['operation'] = self._added_by[e.card_name]
+            raise DeckEditError(
+                f"{e.card_name} is already used in {owner.name if owner else 'another deck'}",
+                409, **extra
+            )
+        release_cards(self.deck.id, self._released_names(added_names))
+
+        Deck.bump_revision(self.deck.id)
+        db.session.flush()
+
+        def apply_deltas(state):
+            for kind, deck_card, value in self._deltas:
+                if kind == 'add':
+                    state.add(deck_card.id, value, deck_card.quantity, deck_card.is_commander)
+                elif kind == 'quantity':
+                    state.set_quantity(deck_card.id, value)
+                else:
+                    state.remove(value)
+
+        incremental_validator.apply(self.deck, self.old_revision, apply_deltas)
+        db.session.commit()
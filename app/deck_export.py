@@ -0,0 +1,230 @@
+"""
+Streaming deck export.
+Reads decks and their cards with one ordered query and renders them as
+they are read, so exporting every deck runs in constant memory. Supports
+plain text, Arena, MTGO .dek, JSON Lines and a zip archive of per-deck
+files built on the fly.
+"""
+
+import io
+import json
+import re
+import zipfile
+from itertools import chain, groupby
+from xml.sax.saxutils import quoteattr
+from sqlalchemy import select
+from app import db
+from app.models import Deck, Card, DeckCard
+
+# Rows fetched from the cursor at a time
+EXPORT_BATCH_SIZE = 500
+
+# format -> (content type, file extension)
+EXPORT_FORMATS = {
+    'text': ('text/plain; charset=utf-8', 'txt'),
+    'arena': ('text/plain; charset=utf-8', 'txt'),
+    'dek': ('application/xml; charset=utf-8', 'dek'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+}
+ZIP_CONTENT_TYPE = 'application/zip'
+
+class ExportRow:
+    """One deck card as read by the export query."""
+
+    __slots__ = ('name', 'quantity', 'is_commander', 'card_id', 'set_code', 'collector_number')
+
+    def __init__(self, row):
+        self.name = row.card_name
+        self.quantity = row.quantity
+        self.is_commander = bool(row.is_commander)
+        self.card_id = row.card_id
+        self.set_code = row.selected_set_code or row.set_code
+        self.collector_number = row.selected_collector_number or row.collector_number
+
+def iter_decks(deck_ids=None):
+    """
+    Stream decks and their cards from one ordered query.
+
+    Commanders come first within each deck, then the other cards by name.
+
+    Args:
+        deck_ids: Optional list of deck IDs to export (default: all decks)
+
+    Yields:
+        (deck row, iterator of ExportRow) per deck, in deck ID order
+    """
+    stmt = (
+        select(
+            Deck.id, Deck.name, Deck.color_identity, Deck.commander_name, Deck.description,
+            DeckCard.quantity, DeckCard.is_commander,
+            DeckCard.selected_set_code, DeckCard.selected_collector_number,
+            Card.id.label('card_id'), Card.name.label('card_name'),
+            Card.set_code, Card.collector_number
+        )
+        .select_from(Deck)
+        .outerjoin(DeckCard, DeckCard.deck_id == Deck.id)
+        .outerjoin(Card, Card.id == DeckCard.card_id)
+        .order_by(Deck.id, DeckCard.is_commander.desc(), Card.name)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    if deck_ids is not None:
+        stmt = stmt.where(Deck.id.in_(deck_ids))
+
+    rows = db.session.execute(stmt)
+    for _, deck_rows in groupby(rows, key=lambda row: row.id):
+        first = next(deck_rows)
+        cards = (ExportRow(row) for row in chain([first], deck_rows) if row.card_name is not None)
+        yield first, cards
+
+# ============================================================================
+# Formats (each renders one deck as chunks of text)
+# ============================================================================
+
+def _sections(cards, commander_header, deck_header, format_line):
+    """Yield a commander section (if any) and the main deck section with headers."""
+    in_commander = False
+    in_deck = False
+    for card in cards:
+        if card.is_commander:
+            if not in_commander:
+                yield commander_header
+                in_commander = True
+        elif not in_deck:
+            if in_commander:
+                yield "\n"
+            yield deck_header
+            in_deck = True
+        yield format_line(card)
+
+    if not in_deck:
+        if in_commander:
+            yield "\n"
+        yield deck_header
+
+def render_text(deck, cards):
+    """Plain text, as produced by the single-deck export."""
+    yield f"# {deck.name}\n"
+    yield f"# Commander: {deck.commander_name or 'None'}\n"
+    yield "\n"
+    yield from _sections(
+        cards, "Commander:\n", "Deck:\n",
+        lambda card: f"{1 if card.is_commander else card.quantity} {card.name}\n"
+    )
+
+def render_arena(deck, cards):
+    """MTG Arena import format, with set and collector number when known."""
+    def line(card):
+        quantity = 1 if card.is_commander else card.quantity
+        if card.set_code and card.collector_number:
+            return f"{quantity} {card.name} ({card.set_code.upper()}) {card.collector_number}\n"
+        return f"{quantity} {card.name}\n"
+
+    yield from _sections(cards, "Commander\n", "Deck\n", line)
+
+def render_dek(deck, cards):
+    """MTGO .dek XML; the commander goes in the sideboard."""
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield ('<Deck xmlns:xsd="http://www.w3.org/2001/XMLSchema" '
+           'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n')
+    yield '  <NetDeckID>0</NetDeckID>\n'
+    yield '  <PreconstructedDeckID>0</PreconstructedDeckID>\n'
+    for card in cards:
+        sideboard = 'true' if card.is_commander else 'false'
+        yield (f'  <Cards Quantity="{card.quantity}" Sideboard="{sideboard}" '
+               f'Name={quoteattr(card.name)} Annotation="0" />\n')
+    yield '</Deck>\n'
+
+def render_jsonl(deck, cards):
+    """One JSON object per deck."""
+    record = {
+        'id': deck.id,
+        'name': deck.name,
+        'color_identity': deck.color_identity,
+        'commander_name': deck.commander_name,
+        'description': deck.description,
+        'cards': [{
+            'card_id': card.card_id,
+            'name': card.name,
+            'quantity': card.quantity,
+            'is_commander': card.is_commander,
+            'set_code': card.set_code,
+            'collector_number': card.collector_number
+        } for card in cards]
+    }
+    yield json.dumps(record) + "\n"
+
+RENDERERS = {
+    'text': render_text,
+    'arena': render_arena,
+    'dek': render_dek,
+    'jsonl': render_jsonl,
+}
+
+# ============================================================================
+# Streams
+# ============================================================================
+
+def stream_export(format_type, deck_ids=None):
+    """
+    Stream decks in one format, one chunk per deck.
+
+    Args:
+        format_type: Key of RENDERERS ('dek' holds a single deck)
+        deck_ids: Optional list of deck IDs (default: all decks)
+
+    Yields:
+        Text chunks
+    """
+    render = RENDERERS[format_type]
+    for index, (deck, cards) in enumerate(iter_decks(deck_ids)):
+        chunk = ''.join(render(deck, cards))
+        # Separate decks with a blank line in the line-based formats
+        yield chunk if index == 0 or format_type == 'jsonl' else "\n" + chunk
+
+def deck_filename(deck, extension):
+    """File name for a deck inside an archive, e.g. '03-WU-Azorius-Fliers.dek'."""
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', deck.name or '').strip('-') or 'deck'
+    return f"{deck.id:02d}-{deck.color_identity}-{slug}.{extension}"
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, unseekable sink that hands written bytes back to a generator."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_zip(format_type, deck_ids=None):
+    """
+    Stream a zip archive with one file per deck, assembled as decks are read.
+
+    Args:
+        format_type: Key of RENDERERS used for each deck's file
+        deck_ids: Optional list of deck IDs (default: all decks)
+
+    Yields:
+        Chunks of the zip file
+    """
+    render = RENDERERS[format_type]
+    extension = EXPORT_FORMATS[format_type][1]
+    buffer = _StreamBuffer()
+
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for deck, cards in iter_decks(deck_ids):
+            with archive.open(deck_filename(deck, extension), 'w') as entry:
+                for chunk in render(deck, cards):
+                    entry.write(chunk.encode('utf-8'))
+            yield buffer.drain()
+
+    yield buffer.drain()
@@ -3,13 +3,290 @@ Deck validation logic for Commander format rules.
 """
 
 from flask import current_app
-from app.models import Deck, Card, DeckCard
+from sqlalchemy.orm import selectinload
+from app.models import Deck, Card, DeckCard, deck_version
+from app.cache import LRUCache, MISSING
+from app.card_attributes import identity_mask
+
+# Validation results keyed by deck_version (deck id, creation time, revision)
+VALIDATION_CACHE_SIZE = 512
+validation_cache = LRUCache(max_entries=VALIDATION_CACHE_SIZE)
+
+# Error messages
+def size_error(total):
+    return f"Deck must be exactly 100 cards (current: {total})"
+
+NO_COMMANDER_ERROR = "Deck must have a commander"
+MULTIPLE_COMMANDERS_ERROR = "Deck can only have one commander (partners not yet supported)"
+
+def illegal_commander_error(name):
+    return f"{name} is not a legal commander. Must be a legendary creature or planeswalker."
+
+def singleton_error(name, count):
+    return f"{name} appears {count} times (singleton format allows only 1 copy)"
+
+def color_identity_error(name, card_identity, deck_identity):
+    return f"{name} ({card_identity}) is outside commander's color identity ({deck_identity})"
+
+def banned_error(name):
+    return f"{name} is banned in Commander format"
+
+class RuleTables:
+    """Lookup tables compiled once from the app config and shared by every rule."""
+
+    def __init__(self, basic_lands, banned):
+        self.basic_lands = frozenset(basic_lands)
+        self.banned = frozenset(banned)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['BASIC_LANDS'], config['COMMANDER_BANNED'])
+
+def get_rule_tables():
+    """Return the current app's compiled rule tables, building them on first use."""
+    tables = current_app.extensions.get('deck_rule_tables')
+    if tables is None:
+        tables = current_app.extensions['deck_rule_tables'] = RuleTables.from_config(current_app.config)
+    return tables
+
+# ============================================================================
+# Rules
+# ============================================================================
+
+# Registered rule classes, run (and reported) in registration order
+RULES = []
+
+def register_rule(rule_class):
+    """Class decorator adding a rule to the default rule set."""
+    RULES.append(rule_class)
+    return rule_class
+
+class Rule:
+    """
+    A deck rule. One instance checks one deck.
+
+    visit() is called for every deck card during the engine's single pass;
+    finish() then reports the rule's errors and warnings. Rules that only
+    need the deck itself can skip visit().
+
+    Rules that also implement add() and remove() are kept current by the
+    incremental validator as cards are added, removed or change quantity
+    (their visit() is add()); other rules are re-run over the deck's cards
+    whenever an incrementally validated deck is checked.
+    """
+
+    def __init__(self, deck, tables):
+        self.deck = deck
+        self.tables = tables
+
+    def visit(self, deck_card):
+        pass
+
+    def add(self, deck_card):
+        """Account for a deck card (keyed by its ID) being added."""
+        raise NotImplementedError
+
+    def remove(self, deck_card):
+        """Forget a deck card previously passed to add()."""
+        raise NotImplementedError
+
+    def finish(self, errors, warnings):
+        pass
+
+def tracks_deltas(rule_class):
+    """Whether a rule implements the add() and remove() hooks."""
+    return rule_class.add is not Rule.add
+
+@register_rule
+class SizeRule(Rule):
+    """Deck has exactly 100 cards."""
+
+    def __init__(self, deck, tables):
+        super().__init__(deck, tables)
+        self.total = 0
+
+    def add(self, deck_card):
+        self.total += deck_card.quantity
+
+    def remove(self, deck_card):
+        self.total -= deck_card.quantity
+
+    visit = add
+
+    def finish(self, errors, warnings):
+        if self.total != 100:
+            errors.append(size_error(self.total))
+
+@register_rule
+class CommanderRule(Rule):
+    """Deck has exactly one commander, and it is a legal one."""
+
+    def __init__(self, deck, tables):
+        super().__init__(deck, tables)
+        self.commanders = {}  # deck card id -> deck card
+
+    def add(self, deck_card):
+        if deck_card.is_commander:
+            self.commanders[deck_card.id] = deck_card
+
+    def remove(self, deck_card):
+        self.commanders.pop(deck_card.id, None)
+
+    visit = add
+
+    def finish(self, errors, warnings):
+        if len(self.commanders) == 0:
+            errors.append(NO_COMMANDER_ERROR)
+        elif len(self.commanders) > 1:
+            errors.append(MULTIPLE_COMMANDERS_ERROR)
+        else:
+            card = next(iter(self.commanders.values())).card
+            if card and not card.is_legal_commander:
+                errors.append(illegal_commander_error(card.name))
+
+@register_rule
+class SingletonRule(Rule):
+    """No duplicates except basic lands."""
+
+    def __init__(self, deck, tables):
+        super().__init__(deck, tables)
+        self.card_counts = {}  # name -> {deck card id: quantity}
+        self.duplicates = set()
+
+    def add(self, deck_card):
+        card = deck_card.card
+        if card and card.name not in self.tables.basic_lands:
+            self.card_counts.setdefault(card.name, {})[deck_card.id] = deck_card.quantity
+            self._check(card.name)
+
+    def remove(self, deck_card):
+        card = deck_card.card
+        counts = self.card_counts.get(card.name) if card else None
+        if counts is not None:
+            counts.pop(deck_card.id, None)
+            if not counts:
+                del self.card_counts[card.name]
+            self._check(card.name)
+
+    visit = add
+
+    def _check(self, name):
+        counts = self.card_counts.get(name)
+        if counts and sum(counts.values()) > 1:
+            self.duplicates.add(name)
+        else:
+            self.duplicates.discard(name)
+
+    def finish(self, errors, warnings):
+        # Names are reported in order of their first appearance in the deck
+        for name in sorted(self.duplicates, key=lambda n: min(self.card_counts[n])):
+            errors.append(singleton_error(name, sum(self.card_counts[name].values())))
+
+@register_rule
+class ColorIdentityRule(Rule):
+    """Cards match the commander's color identity."""
+
+    def __init__(self, deck, tables):
+        super().__init__(deck, tables)
+        self.outside = ~identity_mask(deck) if deck.color_identity else None
+        self.off_identity = {}  # deck card id -> deck card
+
+    def add(self, deck_card):
+        card = deck_card.card
+        if self.outside is not None and card and card.color_identity:
+            if identity_mask(card) & self.outside:
+                self.off_identity[deck_card.id] = deck_card
+
+    def remove(self, deck_card):
+        self.off_identity.pop(deck_card.id, None)
+
+    visit = add
+
+    def finish(self, errors, warnings):
+        for deck_card_id in sorted(self.off_identity):
+            card = self.off_identity[deck_card_id].card
+            errors.append(color_identity_error(card.name, card.color_identity, self.deck.color_identity))
+
+@register_rule
+class BannedCardRule(Rule):
+    """No cards banned in Commander."""
+
+    def __init__(self, deck, tables):
+        super().__init__(deck, tables)
+        self.banned = {}  # deck card id -> deck card
+
+    def add(self, deck_card):
+        card = deck_card.card
+        if card and card.name in self.tables.banned:
+            self.banned[deck_card.id] = deck_card
+
+    def remove(self, deck_card):
+        self.banned.pop(deck_card.id, None)
+
+    visit = add
+
+    def finish(self, errors, warnings):
+        for deck_card_id in sorted(self.banned):
+            errors.append(banned_error(self.banned[deck_card_id].card.name))
+
+# ============================================================================
+# Engine
+# ============================================================================
+
+class RuleEngine:
+    """Runs a set of rules over a deck in a single pass over its cards."""
+
+    def __init__(self, rules=None, tables=None):
+        self.rules = list(RULES if rules is None else rules)
+        self.tables = tables
+
+    def validate(self, deck):
+        """
+        Validate a deck against every rule.
+
+        Args:
+            deck: Deck model instance (load its cards eagerly when validating many)
+
+        Returns:
+            Dictionary with validation results
+        """
+        tables = self.tables or get_rule_tables()
+        checks = [rule(deck, tables) for rule in self.rules]
+        visitors = [check.visit for check in checks if type(check).visit is not Rule.visit]
+
+        for deck_card in deck.cards:
+            for visit in visitors:
+                visit(deck_card)
+
+        errors = []
+        warnings = []
+        for check in checks:
+            check.finish(errors, warnings)
+
+        return {
+            'valid': len(errors) == 0,
+            'errors': errors,
+            'warnings': warnings
+        }
+
+    def validate_many(self, decks):
+        """
+        Validate several decks.
+
+        Args:
+            decks: Deck model instances, ideally loaded with their cards
+
+        Returns:
+            Dictionary of deck ID to validation results
+        """
+        return {deck.id: self.validate(deck) for deck in decks}
 
 class DeckValidator:
     """Validates Commander deck against format rules."""
 
-    def __init__(self, deck):
+    def __init__(self, deck, engine=None):
         self.deck = deck
+        self.engine = engine or RuleEngine()
         self.errors = []
         self.warnings = []
 
@@ -20,86 +297,10 @@ class DeckValidator:
         Returns:
             Dictionary with validation results
         """
-        self.errors = []
-        self.warnings = []
-
-        self._validate_size()
-        self._validate_commander()
-        self._validate_singleton()
-        self._validate_color_identity()
-        self._validate_banned_cards()
-
-        return {
-            'valid': len(self.errors) == 0,
-            'errors': self.errors,
-            'warnings': self.warnings
-        }
-
-    def _validate_size(self):
-        """Validate deck has exactly 100 cards."""
-        total = sum(dc.quantity for dc in self.deck.cards)
-        if total != 100:
-            self.errors.append(f"Deck must be exactly 100 cards (current: {total})")
-        elif total < 100:
-            self.warnings.append(f"Deck needs {100 - total} more cards")
-
-    def _validate_commander(self):
-        """Validate commander requirements."""
-        commanders = [dc for dc in self.deck.cards if dc.is_commander]
-
-        if len(commanders) == 0:
-            self.errors.append("Deck must have a commander")
-        elif len(commanders) > 1:
-            self.errors.append("Deck can only have one commander (partners not yet supported)")
-        else:
-            commander = commanders[0]
-            if commander.card:
-                if not commander.card.is_legal_commander:
-                    self.errors.append(
-                        f"{commander.card.name} is not a legal commander. "
-                        "Must be a legendary creature or planeswalker."
-                    )
-
-    def _validate_singleton(self):
-        """Validate singleton format (no duplicates except basic lands)."""
-        basic_lands = current_app.config['BASIC_LANDS']
-        card_counts = {}
-
-        for dc in self.deck.cards:
-            if dc.card and dc.card.name not in basic_lands:
-                card_counts[dc.card.name] = card_counts.get(dc.card.name, 0) + dc.quantity
-
-        for name, count in card_counts.items():
-            if count > 1:
-                self.errors.append(
-                    f"{name} appears {count} times (singleton format allows only 1 copy)"
-                )
-
-    def _validate_color_identity(self):
-        """Validate cards match commander's color identity."""
-        if not self.deck.color_identity:
-            return
-
-        deck_colors = set(self.deck.color_identity) if self.deck.color_identity != 'C' else set()
-
-        for dc in self.deck.cards:
-            if dc.card and dc.card.color_identity:
-                card_colors = set(dc.card.color_identity.split(',')) if dc.card.color_identity else set()
-                card_colors.discard('')  # Remove empty strings
-
-                if not card_colors.issubset(deck_colors):
-                    self.errors.append(
-                        f"{dc.card.name} ({dc.card.color_identity}) is outside "
-                        f"commander's color identity ({self.deck.color_identity})"
-                    )
-
-    def _validate_banned_cards(self):
-        """Check for banned cards in Commander format."""
-        banned = current_app.config['COMMANDER_BANNED']
-
-        for dc in self.deck.cards:
-            if dc.card and dc.card.name in banned:
-                self.errors.append(f"{dc.card.name} is banned in Commander format")
+        result = self.engine.validate(self.deck)
+        self.errors = result['errors']
+        self.warnings = result['warnings']
+        return result
 
 def validate_deck(deck):
     """
@@ -113,3 +314,59 @@ def validate_deck(deck):
     """
     validator = DeckValidator(deck)
     return validator.validate()
+
+def validate_decks(decks):
+    """
+    Validate many decks in one batch.
+
+    Loads every deck's cards with two queries when given deck IDs.
+
+    Args:
+        decks: Deck model instances, or deck IDs
+
+    Returns:
+        Dictionary of deck ID to validation results
+    """
+    decks = list(decks)
+    if decks and not isinstance(decks[0], Deck):
+        decks = (
+            Deck.query
+            .options(selectinload(Deck.cards).joinedload(DeckCard.card))
+            .filter(Deck.id.in_(decks))
+            .all()
+        )
+    return RuleEngine().validate_many(decks)
+
+def get_cached_validation(deck):
+    """
+    Look up a memoized validation result for the deck's current revision.
+
+    Args:
+        deck: Deck model instance (its cards need not be loaded)
+
+    Returns:
+        Dictionary with validation results, or None if not cached
+    """
+    result = validation_cache.get(deck_version(deck))
+    return None if result is MISSING else result
+
+def validate_deck_cached(deck):
+    """
+    Validate a deck, memoized per deck_version (ID, creation time and revision).
+
+    Misses are served by the incremental validator, which only does a full
+    pass when it holds no state for the deck's current revision.
+
+    Args:
+        deck: Deck model instance
+
+    Returns:
+        Dictionary with validation results
+    """
+    from app.incremental_validator import incremental_validator
+
+    result = get_cached_validation(deck)
+    if result is None:
+        result = incremental_validator.validate(deck)
+        validation_cache.set(deck_version(deck), result)
+    return result
@@ -0,0 +1,205 @@
+"""
+Decklist import.
+Parses text decklists (including the Commander:/Deck: sections written by
+the exporter) into one entry per card, then merges them into a deck as a
+background job: names are resolved in batches so progress is visible, and
+the deck is diffed against the list so only new cards and changed
+quantities are written, in a single transaction.
+"""
+
+import re
+from collections import namedtuple
+from flask import current_app
+from app import db
+from app.models import Deck
+from app.scryfall_service import scryfall_service
+from app.card_usage import find_conflicts
+from app.deck_editor import DeckEditor
+from app.jobs import job_handler
+
+# Section headers, with or without a trailing colon
+COMMANDER_SECTION = 'commander'
+DECK_SECTION = 'deck'
+SIDEBOARD_SECTION = 'sideboard'
+SECTION_HEADERS = {
+    'commander': COMMANDER_SECTION,
+    'deck': DECK_SECTION,
+    'main': DECK_SECTION,
+    'mainboard': DECK_SECTION,
+    'sideboard': SIDEBOARD_SECTION,
+    'maybeboard': SIDEBOARD_SECTION,
+    'considering': SIDEBOARD_SECTION,
+    'companion': SIDEBOARD_SECTION,
+}
+
+# "2 Card Name", "2x Card Name", optionally followed by an Arena "(SET) 123" and "*F*"
+LINE_PATTERN = re.compile(
+    r'^(?:(?P<quantity>\d+)x?\s+)?(?P<name>.+?)'
+    r'(?:\s+\([A-Za-z0-9]+\)(?:\s+\S+)?)?(?:\s+\*[A-Z]+\*)?$'
+)
+
+DecklistEntry = namedtuple('DecklistEntry', ['name', 'quantity', 'section'])
+
+def normalize_card_name(name):
+    """Collapse whitespace in a card name; the lower-cased result is its dedupe key."""
+    return ' '.join(name.split())
+
+def iter_decklist(lines):
+    """
+    Parse decklist lines one at a time.
+
+    Args:
+        lines: Iterable of lines; blank lines and lines starting with # or //
+               are skipped
+
+    Yields:
+        DecklistEntry per card line, in the section it appears under
+    """
+    section = DECK_SECTION
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#') or line.startswith('//'):
+            continue
+
+        header = SECTION_HEADERS.get(line.rstrip(':').strip().lower())
+        if header:
+            section = header
+            continue
+
+        match = LINE_PATTERN.match(line)
+        name = normalize_card_name(match.group('name'))
+        quantity = int(match.group('quantity') or 1)
+        if name and quantity > 0:
+            yield DecklistEntry(name, quantity, section)
+
+def parse_decklist(text):
+    """
+    Parse a text decklist into one entry per card.
+
+    Lines naming the same card (ignoring case and spacing) are merged and
+    their quantities added up; a card listed under Commander is imported as
+    the commander, with quantity 1.
+
+    Args:
+        text: Decklist with one "1 Card Name" or "Card Name" per line, in
+              optional Commander:, Deck: and Sideboard: sections
+
+    Returns:
+        List of DecklistEntry in first-seen order
+    """
+    entries = {}
+    for entry in iter_decklist(text.splitlines()):
+        skipped = entry.section == SIDEBOARD_SECTION
+        key = (entry.name.lower(), skipped)
+        previous = entries.get(key)
+
+        if previous is None:
+            entries[key] = entry
+        elif COMMANDER_SECTION in (entry.section, previous.section):
+            entries[key] = previous._replace(section=COMMANDER_SECTION)
+        else:
+            entries[key] = previous._replace(quantity=previous.quantity + entry.quantity)
+
+    return [
+        entry._replace(quantity=1) if entry.section == COMMANDER_SECTION else entry
+        for entry in entries.values()
+    ]
+
+def _resolve_entries(context, entries):
+    """Resolve entry names in committed batches, reporting progress after each."""
+    batch_size = current_app.config['IMPORT_BATCH_SIZE']
+    resolved = {}
+
+    for start in range(0, len(entries), batch_size):
+        batch = entries[start:start + batch_size]
+
+        # Local cache first, then Scryfall; fetched cards are kept by the commit
+        found, _ = scryfall_service.resolve_card_names(entry.name for entry in batch)
+        resolved.update(found)
+
+        context.progress(start + len(batch))
+        db.session.commit()
+
+    return resolved
+
+@job_handler('import_decklist')
+def import_decklist_job(context, deck_id, entries):
+    """
+    Merge decklist entries into a deck.
+
+    Cards already in the deck with the listed quantity are left untouched,
+    so importing the same list twice changes nothing. Cards not in the list
+    are kept. Sideboard cards are reported as skipped.
+
+    Args:
+        context: JobContext of the running job
+        deck_id: ID of the deck to import into
+        entries: List of DecklistEntry from parse_decklist
+    """
+    wanted = [entry for entry in entries if entry.section != SIDEBOARD_SECTION]
+    resolved = _resolve_entries(context, wanted)
+
+    deck = db.session.get(Deck, deck_id)
+    if deck is None:
+        raise ValueError(f'Deck {deck_id} no longer exists')
+
+    editor = DeckEditor(deck, preload=True)
+    existing = {}
+    for card_id, deck_card in editor.deck_cards.items():
+        card = editor.cards.get(card_id)
+        if card:
+            existing.setdefault(card.name.lower(), deck_card)
+
+    # Entries can resolve to the same card (e.g. a face name and the full name)
+    targets = {}
+    for entry in wanted:
+        card = resolved.get(entry.name)
+        if card:
+            key = card.name.lower()
+            _, quantity, is_commander = targets.get(key, (card, 0, False))
+            is_commander = is_commander or entry.section == COMMANDER_SECTION
+            targets[key] = (card, 1 if is_commander else quantity + entry.quantity, is_commander)
+
+    conflicts = find_conflicts(
+        deck_id, [card.name for key, (card, _, _) in targets.items() if key not in existing]
+    )
+    has_commander = any(dc.is_commander for dc in editor.deck_cards.values())
+
+    # Commanders first, so a legendary creature in the main deck isn't made commander
+    statuses = {}
+    for key, (card, quantity, is_commander) in sorted(targets.items(), key=lambda item: not item[1][2]):
+        deck_card = existing.get(key)
+        if deck_card is None:
+            if card.name in conflicts:
+                statuses[key] = {'status': 'conflict',
+                                 'message': f"Card already used in another deck: {card.name}"}
+                continue
+            editor.add({
+                'card_id': card.id,
+                'quantity': quantity,
+                'is_commander': is_commander and not has_commander
+            })
+            has_commander = has_commander or is_commander
+            statuses[key] = {'status': 'added', 'card_id': card.id}
+        elif deck_card.quantity != quantity and not deck_card.is_commander:
+            editor.update(deck_card.card_id, {'quantity': quantity})
+            statuses[key] = {'status': 'updated', 'card_id': deck_card.card_id}
+        else:
+            statuses[key] = {'status': 'unchanged', 'card_id': deck_card.card_id}
+
+    for entry in entries:
+        result = {'line': entry.name, 'quantity': entry.quantity}
+        card = resolved.get(entry.name)
+        if entry.section == SIDEBOARD_SECTION:
+            result.update(status='skipped', message=f"Sideboard card not imported: {entry.name}")
+        elif not card:
+            result.update(status='not_found', message=f"Card not found: {entry.name}")
+        else:
+            result.update(statuses[card.name.lower()])
+        context.record(result)
+
+    context.progress(len(entries))
+    if editor.has_changes:
+        editor.commit()
+    else:
+        db.session.commit()
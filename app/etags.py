@@ -0,0 +1,103 @@
+"""
+Conditional GET support.
+Read endpoints are tagged with strong ETags derived from deck revisions, so
+a client holding the current payload gets a 304 Not Modified after one
+indexed lookup instead of a full load, validation and serialization.
+"""
+
+import hashlib
+import json
+from functools import wraps
+from flask import current_app, request
+from sqlalchemy import select
+from app import db
+from app.models import Deck, parse_fields
+
+# Content encodings a response may be compressed with (see app.compression)
+CONTENT_ENCODINGS = ('br', 'gzip')
+
+def encoded_etag(etag, encoding):
+    """ETag of a representation compressed with a content encoding."""
+    return f"{etag}-{encoding}"
+
+def fields_etag(etag, fields):
+    """
+    ETag of a sparse fieldset representation (fields from parse_fields).
+    The fieldset is normalized, so 'name,id' and 'id,name' share a tag.
+    """
+    if fields is None:
+        return etag
+    spec = json.dumps(fields, sort_keys=True, separators=(',', ':'))
+    return f"{etag}-f{hashlib.sha1(spec.encode('utf-8')).hexdigest()[:12]}"
+
+def _matching_etag(etag):
+    """The tag in If-None-Match naming this ETag in any encoding, or None."""
+    if_none_match = request.if_none_match
+    for candidate in (etag, *(encoded_etag(etag, e) for e in CONTENT_ENCODINGS)):
+        if if_none_match.contains(candidate):
+            return candidate
+    return None
+
+def _deck_key(deck_id, revision, created_at):
+    # created_at tells apart a deck created under a reused ID
+    created = created_at.isoformat() if created_at else ''
+    return f"{deck_id}:{revision}:{created}"
+
+def deck_etag(deck_id):
+    """
+    ETag of one deck, from its revision (primary key lookup).
+
+    Returns:
+        ETag string, or None if the deck does not exist
+    """
+    row = db.session.execute(
+        select(Deck.revision, Deck.created_at).where(Deck.id == deck_id)
+    ).first()
+    if row is None:
+        return None
+    return f"deck-{_deck_key(deck_id, row.revision, row.created_at)}"
+
+def decks_etag():
+    """
+    ETag of the whole set of decks: changes when any deck is created,
+    deleted or revised. Serves as the challenge revision as well.
+    """
+    rows = db.session.execute(
+        select(Deck.id, Deck.revision, Deck.created_at).order_by(Deck.id)
+    )
+    digest = hashlib.sha1()
+    for row in rows:
+        digest.update(_deck_key(row.id, row.revision, row.created_at).encode('utf-8'))
+        digest.update(b';')
+    return f"decks-{digest.hexdigest()[:20]}"
+
+def conditional(etag_for):
+    """
+    Decorator answering If-None-Match with 304 before the view runs.
+    Responses limited with ?fields= get their own ETag per fieldset.
+
+    Args:
+        etag_for: Function called with the view's arguments that returns the
+                  current ETag, or None to run the view unconditionally
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            etag = etag_for(*args, **kwargs)
+            if etag is not None:
+                etag = fields_etag(etag, parse_fields(request.args.get('fields')))
+            matched = _matching_etag(etag) if etag is not None else None
+            if matched is not None:
+                response = current_app.response_class(status=304)
+                etag = matched
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if etag is None or response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            # Let browsers keep the payload but revalidate it on every use
+            response.cache_control.no_cache = True
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,238 @@
+"""
+Incremental deck validation.
+Keeps per-deck validation state (one check per registered deck rule) and
+updates it from the add, remove and quantity deltas made by the deck-card
+routes, so validating after an edit costs O(1) instead of a full pass over
+the deck.
+"""
+
+import threading
+from flask import current_app
+from sqlalchemy import inspect
+from app import db
+from app.models import Deck, Card, DeckCard, deck_version
+from app.cache import LRUCache, MISSING
+from app.deck_validator import RULES, DeckValidator, get_rule_tables, tracks_deltas
+from app.read_models import CardRow, DeckRow
+
+def _snapshot(row_class, obj):
+    """
+    Copy a model instance's columns into a read-model row, which outlives the
+    request's session (read-model rows are used as they are).
+    """
+    if isinstance(obj, row_class):
+        return obj
+    return row_class([getattr(obj, name) for name in row_class.COLUMNS])
+
+class _Entry:
+    """One deck card as the rules see it: its card, quantity and commander flag."""
+
+    __slots__ = ('id', 'card', 'quantity', 'is_commander')
+
+    def __init__(self, deck_card_id, card, quantity, is_commander):
+        self.id = deck_card_id
+        self.card = _snapshot(CardRow, card) if card else None
+        self.quantity = quantity
+        self.is_commander = is_commander
+
+class DeckValidationState:
+    """
+    Running validation state for one deck revision.
+
+    Rules with add() and remove() hooks are applied each delta; other
+    rules are re-run over the entries when the result is built. Entries are
+    keyed by deck card id; since ids only grow, they stay in the order of a
+    full validation.
+    """
+
+    def __init__(self, deck, tables, rules=None):
+        self.deck_id = deck.id
+        self.created_at = deck.created_at
+        self.revision = deck.revision
+        self.deck = _snapshot(DeckRow, deck)
+        self.tables = tables
+
+        self.entries = {}
+        # (rule, its running check, or None for rules without delta hooks)
+        self.checks = [
+            (rule, rule(self.deck, tables) if tracks_deltas(rule) else None)
+            for rule in (RULES if rules is None else rules)
+        ]
+        self.tracked = [check for rule, check in self.checks if check is not None]
+
+    @property
+    def version(self):
+        """The deck_version this state reflects."""
+        return (self.deck_id, self.created_at, self.revision)
+
+    def add(self, deck_card_id, card, quantity, is_commander=False):
+        """Apply a card being added to the deck."""
+        entry = _Entry(deck_card_id, card, quantity, is_commander)
+        self.entries[deck_card_id] = entry
+        for check in self.tracked:
+            check.add(entry)
+
+    def remove(self, deck_card_id):
+        """Apply a card being removed from the deck."""
+        entry = self.entries.pop(deck_card_id, None)
+        if entry is None:
+            return
+        for check in self.tracked:
+            check.remove(entry)
+
+    def set_quantity(self, deck_card_id, quantity):
+        """Apply a change to a card's quantity."""
+        entry = self.entries.get(deck_card_id)
+        if entry is None:
+            return
+        for check in self.tracked:
+            check.remove(entry)
+        entry.quantity = quantity
+        for check in self.tracked:
+            check.add(entry)
+
+    def result(self):
+        """
+        Build the validation result from the current state.
+
+        Returns:
+            Dictionary with validation results, identical to DeckValidator.validate()
+        """
+        errors = []
+        warnings = []
+        for rule, check in self.checks:
+            if check is None:
+                check = rule(self.deck, self.tables)
+                for entry in self.entries.values():
+                    check.visit(entry)
+            check.finish(errors, warnings)
+
+        return {
+            'valid': len(errors) == 0,
+            'errors': errors,
+            'warnings': warnings
+        }
+
+class IncrementalValidator:
+    """Per-deck validation states, kept current by deltas and keyed to deck versions."""
+
+    def __init__(self, max_decks=256):
+        self._states = LRUCache(max_entries=max_decks)
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.deltas = 0
+
+    def build(self, deck):
+        """
+        Build a deck's validation state from scratch.
+
+        Uses the deck's cards when already loaded (always, for a read model),
+        otherwise one query over the deck's cards joined with their card rows.
+
+        Args:
+            deck: Deck model instance or read_models.DeckRow
+
+        Returns:
+            DeckValidationState for the deck's current revision
+        """
+        state = DeckValidationState(deck, get_rule_tables())
+
+        if not isinstance(deck, Deck) or 'cards' not in inspect(deck).unloaded:
+            for dc in deck.cards:
+                state.add(dc.id, dc.card, dc.quantity, dc.is_commander)
+        else:
+            rows = (
+                db.session.query(DeckCard.id, DeckCard.quantity, DeckCard.is_commander, Card)
+                .outerjoin(Card, Card.id == DeckCard.card_id)
+                .filter(DeckCard.deck_id == deck.id)
+                .order_by(DeckCard.id)
+            )
+            for deck_card_id, quantity, is_commander, card in rows:
+                state.add(deck_card_id, card, quantity, is_commander)
+
+        self.rebuilds += 1
+        return state
+
+    def validate(self, deck):
+        """
+        Validate a deck from its incremental state, rebuilding it if stale.
+
+        Args:
+            deck: Deck model instance
+
+        Returns:
+            Dictionary with validation results
+        """
+        with self._lock:
+            state = self._states.get(deck.id)
+            if state is not MISSING and state.version == deck_version(deck):
+                return state.result()
+
+        state = self.build(deck)
+        with self._lock:
+            self._states.set(deck.id, state)
+            return state.result()
+
+    def apply(self, deck, old_revision, delta=None):
+        """
+        Apply an edit to a deck's state.
+
+        The state is only updated when it matches the deck version the edit
+        was made against (same deck ID, creation time and old revision);
+        otherwise it is dropped and rebuilt on the next validation. Call it
+        before committing: if the commit fails, the state is left at a
+        revision the deck never reaches and is rebuilt.
+
+        Args:
+            deck: Edited Deck model instance, already at its new revision
+            old_revision: Deck revision before the edit
+            delta: Callable applying the edit to a DeckValidationState
+                   (omit for edits that don't affect validation)
+        """
+        with self._lock:
+            state = self._states.get(deck.id)
+            if state is MISSING:
+                return
+            if state.version != (deck.id, deck.created_at, old_revision):
+                self._states.delete(deck.id)
+                return
+
+            if delta is not None:
+                delta(state)
+            state.revision = deck.revision
+            self.deltas += 1
+
+    def discard(self, deck_id):
+        """Forget a deck's state (e.g. when the deck is deleted)."""
+        self._states.delete(deck_id)
+
+    def verify(self, deck):
+        """
+        Check the incremental result against a full validation.
+
+        On a mismatch the state is rebuilt from the database and a warning logged.
+
+        Args:
+            deck: Deck model instance
+
+        Returns:
+            Dictionary with the full validation results
+        """
+        incremental = self.validate(deck)
+        full = DeckValidator(deck).validate()
+        if incremental != full:
+            current_app.logger.warning(
+                f"Incremental validation of deck {deck.id} diverged from full validation"
+            )
+            self.discard(deck.id)
+        return full
+
+    def stats(self):
+        return {
+            'decks': len(self._states),
+            'rebuilds': self.rebuilds,
+            'deltas': self.deltas
+        }
+
+# Create a singleton instance
+incremental_validator = IncrementalValidator()
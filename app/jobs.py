@@ -0,0 +1,137 @@
+"""
+Background jobs.
+Runs long operations (decklist imports and other Scryfall-heavy work) on a
+bounded in-process worker pool. Each job is a row in the jobs table holding
+its status, progress and per-item results, so clients poll /api/jobs/<id>
+instead of holding a request open on rate-limited network I/O.
+"""
+
+import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import Job
+
+# Job functions by kind, registered with @job_handler
+JOB_HANDLERS = {}
+
+def job_handler(kind):
+    """
+    Register a function to run jobs of a kind.
+
+    The function is called as fn(context, *args) inside an app context, where
+    context is a JobContext for reporting results and progress.
+    """
+    def decorator(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+class JobContext:
+    """Lets a running job record per-item results and report progress."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.results = []
+        self.processed = 0
+
+    def record(self, result):
+        """Add the result of one item (e.g. one decklist line)."""
+        self.results.append(result)
+
+    def progress(self, processed):
+        """
+        Store progress and the results so far on the job row.
+        Saved by the job's next commit, together with the work it describes.
+        """
+        self.processed = processed
+        job = db.session.get(Job, self.job_id)
+        job.processed = processed
+        job.results = json.dumps(self.results)
+
+class JobRunner:
+    """Bounded worker pool running jobs stored in the jobs table."""
+
+    def __init__(self):
+        self.max_workers = 2
+        self.run_inline = False
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the runner from the Flask app config."""
+        self.max_workers = app.config.get('JOBS_MAX_WORKERS', self.max_workers)
+        self.run_inline = app.config.get('JOBS_RUN_INLINE', self.run_inline)
+
+    def _get_executor(self):
+        """Thread pool for jobs, created on first use."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='job'
+                    )
+        return self._executor
+
+    def submit(self, kind, *args, total=0, deck_id=None):
+        """
+        Create a job and queue it for a worker.
+
+        Args:
+            kind: Registered job kind
+            *args: Arguments passed to the job function (must not be ORM objects)
+            total: Number of items the job will process, for progress reporting
+            deck_id: Deck the job works on, if any
+
+        Returns:
+            The new Job (already committed)
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f'Unknown job kind: {kind}')
+
+        job = Job(id=uuid.uuid4().hex, kind=kind, status='pending', total=total, deck_id=deck_id)
+        db.session.add(job)
+        db.session.commit()
+
+        if self.run_inline:
+            self._run(job.id, kind, args)
+        else:
+            app = current_app._get_current_object()
+            self._get_executor().submit(self._run_in_app, app, job.id, kind, args)
+        return job
+
+    def _run_in_app(self, app, job_id, kind, args):
+        with app.app_context():
+            self._run(job_id, kind, args)
+
+    def _run(self, job_id, kind, args):
+        """Run a job, marking it running, then completed or failed."""
+        job = db.session.get(Job, job_id)
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        context = JobContext(job_id)
+        try:
+            JOB_HANDLERS[kind](context, *args)
+        except Exception as e:
+            # Work committed by earlier batches (and its progress) is kept
+            db.session.rollback()
+            current_app.logger.error(f"Job {job_id} ({kind}) failed: {e}")
+            job = db.session.get(Job, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+        else:
+            job = db.session.get(Job, job_id)
+            job.status = 'completed'
+            job.processed = context.processed
+            job.results = json.dumps(context.results)
+
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+# Create a singleton instance
+job_runner = JobRunner()
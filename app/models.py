@@ -2,8 +2,50 @@
 Database models for MTG Commander Deck Builder.
 """
 
+import json
 from datetime import datetime
+from sqlalchemy.orm import validates
 from app import db
+from app.card_attributes import color_mask, type_flags
+
+def parse_fields(spec):
+    """
+    Parse a sparse fieldset such as 'id,name,cards.quantity,cards.card.name'.
+
+    Args:
+        spec: Comma-separated field names, with dots selecting nested fields
+
+    Returns:
+        Nested dictionary of field name -> sub-fields (None for the whole
+        value), or None when every field is wanted
+    """
+    if not spec:
+        return None
+
+    fields = {}
+    for path in spec.split(','):
+        parts = [part.strip() for part in path.split('.') if part.strip()]
+        node = fields
+        for index, part in enumerate(parts):
+            if index == len(parts) - 1:
+                node[part] = None
+            elif part in node and node[part] is None:
+                break  # the whole value is already requested
+            else:
+                node = node.setdefault(part, {})
+    return fields or None
+
+def select_fields(data, fields):
+    """Keep only the requested keys of a to_dict result."""
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields}
+
+def _subfields(fields, name):
+    return fields.get(name) if fields is not None else None
+
+def _wants(fields, name):
+    return fields is None or name in fields
 
 class Deck(db.Model):
     """Represents a Commander deck."""
@@ -12,36 +54,71 @@ class Deck(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     color_identity = db.Column(db.String(10), nullable=False)
+    color_identity_mask = db.Column(db.Integer, index=True)  # WUBRG bitmask, kept in sync with color_identity
     commander_id = db.Column(db.String(50))  # Scryfall ID of commander
     commander_name = db.Column(db.String(200))
     description = db.Column(db.Text)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped on every change
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    cards = db.relationship('DeckCard', backref='deck', lazy=True, cascade='all, delete-orphan')
+    cards = db.relationship('DeckCard', backref='deck', lazy=True, cascade='all, delete-orphan',
+                            order_by='DeckCard.id')
 
     def __repr__(self):
         return f'<Deck {self.name} ({self.color_identity})>'
 
-    def to_dict(self, include_cards=False):
-        """Convert deck to dictionary."""
+    @validates('color_identity')
+    def _sync_color_identity_mask(self, key, value):
+        self.color_identity_mask = color_mask(value)
+        return value
+
+    @classmethod
+    def bump_revision(cls, deck_id):
+        """Atomically increment a deck's revision. Call on every deck or deck card change."""
+        cls.query.filter_by(id=deck_id).update({cls.revision: cls.revision + 1})
+
+    def to_dict(self, include_cards=False, card_count=None, fields=None):
+        """
+        Convert deck to dictionary.
+
+        Args:
+            include_cards: Include the deck's cards (load them eagerly to avoid N+1 queries)
+            card_count: Precomputed card count; computed from the cards when omitted
+            fields: Sparse fieldset from parse_fields (default: every field)
+        """
+        if card_count is None and _wants(fields, 'card_count'):
+            card_count = sum(dc.quantity for dc in self.cards)
+
         result = {
             'id': self.id,
             'name': self.name,
             'color_identity': self.color_identity,
+            'color_identity_mask': self.color_identity_mask,
             'commander_id': self.commander_id,
             'commander_name': self.commander_name,
             'description': self.description,
-            'card_count': sum(dc.quantity for dc in self.cards),
+            'revision': self.revision,
+            'card_count': card_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
-        if include_cards:
-            result['cards'] = [dc.to_dict() for dc in self.cards]
+        if include_cards and _wants(fields, 'cards'):
+            card_fields = _subfields(fields, 'cards')
+            result['cards'] = [dc.to_dict(fields=card_fields) for dc in self.cards]
+
+        return select_fields(result, fields)
+
+def deck_version(deck):
+    """
+    Key identifying a deck's contents, for memoizing results per revision.
 
-        return result
+    Includes created_at because SQLite reuses the ID of a deleted deck and
+    the new deck starts again at revision 0.
+    """
+    return (deck.id, deck.created_at, deck.revision)
 
 class Card(db.Model):
     """Represents a Magic card from Scryfall."""
@@ -50,21 +127,23 @@ class Card(db.Model):
     id = db.Column(db.String(50), primary_key=True)  # Scryfall ID
     name = db.Column(db.String(200), nullable=False, index=True)
     mana_cost = db.Column(db.String(50))
-    cmc = db.Column(db.Float)
+    cmc = db.Column(db.Float, index=True)
     type_line = db.Column(db.String(200))
+    type_flags = db.Column(db.Integer)  # TYPE_FLAGS bitfield, kept in sync with type_line
     oracle_text = db.Column(db.Text)
     colors = db.Column(db.String(20))
     color_identity = db.Column(db.String(20))
+    color_identity_mask = db.Column(db.Integer, index=True)  # WUBRG bitmask, kept in sync with color_identity
     power = db.Column(db.String(10))
     toughness = db.Column(db.String(10))
     loyalty = db.Column(db.String(10))
     image_url = db.Column(db.String(500))
     image_url_small = db.Column(db.String(500))  # Small version for hover
-    is_legal_commander = db.Column(db.Boolean, default=False)
+    is_legal_commander = db.Column(db.Boolean, default=False, index=True)
     is_banned = db.Column(db.Boolean, default=False)
-    set_code = db.Column(db.String(10))
+    set_code = db.Column(db.String(10), index=True)
     set_name = db.Column(db.String(100))
-    rarity = db.Column(db.String(20))
+    rarity = db.Column(db.String(20), index=True)
     collector_number = db.Column(db.String(20))
 
     # Relationships
@@ -73,17 +152,29 @@ class Card(db.Model):
     def __repr__(self):
         return f'<Card {self.name}>'
 
-    def to_dict(self):
-        """Convert card to dictionary."""
-        return {
+    @validates('color_identity')
+    def _sync_color_identity_mask(self, key, value):
+        self.color_identity_mask = color_mask(value)
+        return value
+
+    @validates('type_line')
+    def _sync_type_flags(self, key, value):
+        self.type_flags = type_flags(value)
+        return value
+
+    def to_dict(self, fields=None):
+        """Convert card to dictionary, optionally limited to a sparse fieldset."""
+        return select_fields({
             'id': self.id,
             'name': self.name,
             'mana_cost': self.mana_cost,
             'cmc': self.cmc,
             'type_line': self.type_line,
+            'type_flags': self.type_flags,
             'oracle_text': self.oracle_text,
             'colors': self.colors,
             'color_identity': self.color_identity,
+            'color_identity_mask': self.color_identity_mask,
             'power': self.power,
             'toughness': self.toughness,
             'loyalty': self.loyalty,
@@ -95,7 +186,10 @@ class Card(db.Model):
             'set_name': self.set_name,
             'rarity': self.rarity,
             'collector_number': self.collector_number
-        }
+        }, fields)
+
+# Case-insensitive name lookups (name COLLATE NOCASE) when resolving decklists
+db.Index('ix_cards_name_nocase', Card.name.collate('NOCASE'))
 
 class DeckCard(db.Model):
     """Many-to-many relationship between Decks and Cards."""
@@ -118,9 +212,9 @@ class DeckCard(db.Model):
     def __repr__(self):
         return f'<DeckCard deck_id={self.deck_id} card_id={self.card_id}>'
 
-    def to_dict(self):
-        """Convert deck card to dictionary."""
-        return {
+    def to_dict(self, fields=None):
+        """Convert deck card to dictionary, optionally limited to a sparse fieldset."""
+        result = {
             'id': self.id,
             'deck_id': self.deck_id,
             'card_id': self.card_id,
@@ -130,6 +224,103 @@ class DeckCard(db.Model):
             'selected_printing_id': self.selected_printing_id,
             'selected_image_url': self.selected_image_url,
             'selected_set_code': self.selected_set_code,
-            'selected_collector_number': self.selected_collector_number,
-            'card': self.card.to_dict() if self.card else None
+            'selected_collector_number': self.selected_collector_number
+        }
+        if _wants(fields, 'card'):
+            result['card'] = self.card.to_dict(_subfields(fields, 'card')) if self.card else None
+        return select_fields(result, fields)
+
+# Point lookups of a card in a deck
+db.Index('ix_deck_cards_deck_id_card_id', DeckCard.deck_id, DeckCard.card_id)
+
+class Printing(db.Model):
+    """Represents a single printing of a card, cached from Scryfall."""
+    __tablename__ = 'printings'
+
+    id = db.Column(db.String(50), primary_key=True)  # Scryfall ID of the printing
+    oracle_id = db.Column(db.String(50), index=True)
+    name = db.Column(db.String(200), nullable=False, index=True)
+    set_code = db.Column(db.String(10))
+    set_name = db.Column(db.String(100))
+    collector_number = db.Column(db.String(20))
+    rarity = db.Column(db.String(20))
+    released_at = db.Column(db.String(10))
+    image_url = db.Column(db.String(500))
+    image_url_small = db.Column(db.String(500))
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Printing {self.name} ({self.set_code} #{self.collector_number})>'
+
+    def to_dict(self):
+        """Convert printing to dictionary."""
+        return {
+            'id': self.id,
+            'oracle_id': self.oracle_id,
+            'name': self.name,
+            'set_code': self.set_code,
+            'set_name': self.set_name,
+            'collector_number': self.collector_number,
+            'rarity': self.rarity,
+            'released_at': self.released_at,
+            'image_url': self.image_url,
+            'image_url_small': self.image_url_small
         }
+
+class CardUsage(db.Model):
+    """Records which deck owns each non-basic card name (one deck per card)."""
+    __tablename__ = 'card_usage'
+
+    card_name = db.Column(db.String(200), primary_key=True)
+    deck_id = db.Column(db.Integer, db.ForeignKey('decks.id'), nullable=False, index=True)
+    claimed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CardUsage {self.card_name} deck_id={self.deck_id}>'
+
+class Job(db.Model):
+    """A background job (e.g. a decklist import) with progress and per-item results."""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending/running/completed/failed
+    deck_id = db.Column(db.Integer, db.ForeignKey('decks.id'), index=True)
+    total = db.Column(db.Integer, default=0)
+    processed = db.Column(db.Integer, default=0)
+    results = db.Column(db.Text)  # JSON list of per-item results
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+    def to_dict(self):
+        """Convert job to dictionary."""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'deck_id': self.deck_id,
+            'total': self.total,
+            'processed': self.processed,
+            'results': json.loads(self.results) if self.results else [],
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class BulkImport(db.Model):
+    """A completed Scryfall bulk-data import (written by import_bulk_data.py)."""
+    __tablename__ = 'bulk_imports'
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(500))  # bulk-data file name
+    card_count = db.Column(db.Integer, nullable=False)
+    completed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<BulkImport {self.source} ({self.card_count} cards)>'
@@ -0,0 +1,131 @@
+"""
+In-process card name index for autocomplete.
+Keeps every card name from the cards table in a sorted array of normalized
+keys so prefix lookups are a binary search instead of a Scryfall request.
+"""
+
+import bisect
+import re
+import threading
+import unicodedata
+from sqlalchemy import event
+from app import db
+from app.models import Card
+
+_NON_ALNUM = re.compile(r'[^a-z0-9 ]+')
+_SPACES = re.compile(r'\s+')
+
+def normalize_name(name):
+    """Normalize a card name for matching: strip accents, case and punctuation."""
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+    stripped = _NON_ALNUM.sub('', stripped.replace('-', ' '))
+    return _SPACES.sub(' ', stripped).strip()
+
+class CardNameIndex:
+    """Sorted prefix index over card names, built lazily from the database."""
+
+    def __init__(self):
+        self._entries = []  # sorted list of (normalized key, display name)
+        self._names = set()
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def _keys_for(self, name):
+        """Index the full name and, for multi-face cards, each face name."""
+        keys = {normalize_name(name)}
+        if ' // ' in name:
+            keys.update(normalize_name(face) for face in name.split(' // '))
+        return [(key, name) for key in keys if key]
+
+    def load(self):
+        """(Re)build the index from all card names in the database."""
+        names = {name for (name,) in db.session.query(Card.name).distinct()}
+        entries = sorted(entry for name in names for entry in self._keys_for(name))
+        with self._lock:
+            self._entries = entries
+            self._names = names
+            self.loaded = True
+
+    def add(self, names):
+        """Add newly inserted card names to a loaded index."""
+        if not self.loaded:
+            return  # The lazy load will read them from the database
+
+        with self._lock:
+            new_names = {n for n in names if n and n not in self._names}
+            if not new_names:
+                return
+
+            new_entries = [entry for name in new_names for entry in self._keys_for(name)]
+            if len(new_entries) > 64:
+                self._entries = sorted(self._entries + new_entries)
+            else:
+                for entry in new_entries:
+                    bisect.insort(self._entries, entry)
+            self._names.update(new_names)
+
+    def search(self, prefix, limit=20):
+        """
+        Return card names whose normalized name (or face name) starts with prefix.
+
+        Args:
+            prefix: Text typed by the user
+            limit: Maximum number of suggestions
+
+        Returns:
+            List of display names in alphabetical order
+        """
+        if not self.loaded:
+            self.load()
+
+        key = normalize_name(prefix)
+        if not key:
+            return []
+
+        results = []
+        seen = set()
+        with self._lock:
+            entries = self._entries
+            i = bisect.bisect_left(entries, (key,))
+            while i < len(entries) and len(results) < limit:
+                entry_key, name = entries[i]
+                if not entry_key.startswith(key):
+                    break
+                if name not in seen:
+                    seen.add(name)
+                    results.append(name)
+                i += 1
+        return results
+
+    def names_for(self, name):
+        """
+        Card names whose full name or a face name matches name exactly once
+        normalized (e.g. 'delver of secrets' -> 'Delver of Secrets // Insectile Aberration').
+        """
+        if not self.loaded:
+            self.load()
+
+        key = normalize_name(name)
+        if not key:
+            return []
+
+        names = []
+        with self._lock:
+            entries = self._entries
+            i = bisect.bisect_left(entries, (key,))
+            while i < len(entries) and entries[i][0] == key:
+                names.append(entries[i][1])
+                i += 1
+        return names
+
+    def __len__(self):
+        return len(self._names)
+
+# Create a singleton instance
+card_name_index = CardNameIndex()
+
+@event.listens_for(Card, 'after_insert')
+def _index_inserted_card(mapper, connection, target):
+    """Keep the index current for cards inserted through the ORM."""
+    card_name_index.add([target.name])
@@ -0,0 +1,96 @@
+"""
+Printings catalogue.
+Serves card printings from the local printings table, fetching them from
+Scryfall on first use and refreshing stale entries as background jobs.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import Printing
+from app.database import upsert_printings
+from app.scryfall_service import scryfall_service
+from app.jobs import job_handler, job_runner
+
+_refresh_lock = threading.Lock()
+_refreshing = set()
+
+def refresh_printings(card_name):
+    """
+    Fetch every printing of a card from Scryfall and store it.
+
+    Args:
+        card_name: Name of the card
+
+    Returns:
+        List of printing dictionaries
+    """
+    printings = scryfall_service.get_all_printings(card_name)
+    if printings:
+        upsert_printings(printings, datetime.utcnow())
+        db.session.commit()
+    return printings
+
+@job_handler('refresh_printings')
+def refresh_printings_job(context, card_name):
+    """Refresh a card's stale printings (queued by get_printings)."""
+    try:
+        printings = refresh_printings(card_name)
+        context.record({'name': card_name, 'printings': len(printings or [])})
+        context.progress(1)
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(card_name.lower())
+
+def _schedule_refresh(card_name):
+    """
+    Queue a refresh of a card's printings on the bounded job pool, so a burst
+    of stale cards waits for a worker instead of starting a thread each
+    (once at a time per card).
+    """
+    key = card_name.lower()
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    try:
+        job_runner.submit('refresh_printings', card_name, total=1)
+    except Exception:
+        with _refresh_lock:
+            _refreshing.discard(key)
+        raise
+
+def get_printings(card_name):
+    """
+    Get all printings of a card, preferring the local catalogue.
+
+    Args:
+        card_name: Name of the card
+
+    Returns:
+        List of printing dictionaries, newest first
+    """
+    query = (
+        Printing.query
+        .filter(Printing.name == card_name)
+        .order_by(Printing.released_at.desc(), Printing.collector_number)
+    )
+    printings = query.all()
+
+    if not printings:
+        fetched = refresh_printings(card_name)
+        # Scryfall may have matched a differently-cased name; return its results as-is
+        printings = query.all() if fetched else []
+        if fetched and not printings:
+            return fetched
+
+    # Serialize first: queueing the refresh commits, which expires the rows
+    result = [p.to_dict() for p in printings]
+    oldest = min(p.fetched_at for p in printings) if printings else None
+    max_age = timedelta(seconds=current_app.config['PRINTINGS_TTL'])
+    if oldest is not None and datetime.utcnow() - oldest > max_age:
+        _schedule_refresh(card_name)
+
+    return result
@@ -0,0 +1,66 @@
+"""
+SQL query budget guard.
+Counts the statements a view executes so read endpoints cannot silently
+regress into N+1 query patterns.
+"""
+
+import threading
+from functools import wraps
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_state = threading.local()
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised (in strict mode) when a view executes more queries than allowed."""
+
+class QueryCounter:
+    """Context manager counting SQL statements executed on the current thread."""
+
+    def __init__(self):
+        self.count = 0
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = getattr(_state, 'counter', None)
+        _state.counter = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _state.counter = self._previous
+        if self._previous is not None:
+            self._previous.count += self.count
+        return False
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = getattr(_state, 'counter', None)
+    if counter is not None:
+        counter.count += 1
+
+def query_budget(limit):
+    """
+    Decorator enforcing a maximum number of SQL statements for a view.
+
+    When QUERY_BUDGET_STRICT is set (as in testing) exceeding the budget raises
+    QueryBudgetExceeded; otherwise a warning is logged.
+
+    Args:
+        limit: Maximum number of statements the view may execute
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            with QueryCounter() as counter:
+                response = view(*args, **kwargs)
+
+            if counter.count > limit:
+                message = f"{view.__name__} executed {counter.count} queries (budget: {limit})"
+                if current_app.config.get('QUERY_BUDGET_STRICT'):
+                    raise QueryBudgetExceeded(message)
+                current_app.logger.warning(message)
+
+            return response
+        return wrapped
+    return decorator
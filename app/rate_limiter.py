@@ -0,0 +1,113 @@
+"""
+Token-bucket rate limiter shared between threads and processes.
+Bucket state can live in a small SQLite file so that every worker
+process on the host draws from the same budget.
+"""
+
+import sqlite3
+import threading
+import time
+
+class TokenBucket:
+    """Thread-safe token bucket, optionally coordinated across processes."""
+
+    def __init__(self, rate, capacity=1, path=None, name='default'):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens (burst size)
+            path: SQLite file holding the shared bucket state; None keeps it in-process
+            name: Bucket name, so several limiters can share one file
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.path = path
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._tokens = self.capacity
+        self._updated = time.time()
+
+        self._requests = 0
+        self._throttled = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS token_buckets '
+                '(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+        return self._conn
+
+    def _reserve(self, state):
+        """Take one token from (tokens, updated) and return (tokens, updated, wait)."""
+        tokens, updated = state
+        now = time.time()
+        tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+        tokens -= 1
+
+        # A negative balance is a reservation: wait until it has been refilled
+        wait = -tokens / self.rate if tokens < 0 else 0.0
+        return tokens, now, wait
+
+    def _reserve_shared(self):
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the database write lock, serializing processes
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated FROM token_buckets WHERE name = ?', (self.name,)
+            ).fetchone()
+            tokens, updated, wait = self._reserve(row or (self.capacity, time.time()))
+            conn.execute(
+                'INSERT OR REPLACE INTO token_buckets (name, tokens, updated) VALUES (?, ?, ?)',
+                (self.name, tokens, updated)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def acquire(self):
+        """
+        Block until a token is available.
+
+        Returns:
+            Number of seconds the caller waited
+        """
+        with self._lock:
+            if self.path:
+                wait = self._reserve_shared()
+            else:
+                self._tokens, self._updated, wait = self._reserve((self._tokens, self._updated))
+
+            self._requests += 1
+            self._last_wait = wait
+            if wait > 0:
+                self._throttled += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def stats(self):
+        """Return throttling statistics for this process."""
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'throttled': self._throttled,
+                'total_wait': round(self._total_wait, 3),
+                'max_wait': round(self._max_wait, 3),
+                'last_wait': round(self._last_wait, 3),
+                'avg_wait': round(self._total_wait / self._requests, 4) if self._requests else 0.0
+            }
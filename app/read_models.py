@@ -0,0 +1,129 @@
+"""
+Read models.
+Read-only projections of decks, deck cards and cards, loaded with Core
+selects into compact __slots__ rows instead of ORM instances, so hot GET
+endpoints skip identity-map bookkeeping and change tracking. Rows share the
+models' to_dict() and expose the attributes the deck validator reads; all
+writes go through the ORM models.
+"""
+
+from collections import namedtuple
+from sqlalchemy import func, inspect, select
+from app import db
+from app.models import Deck, Card, DeckCard
+
+def _column_names(model):
+    return tuple(attr.key for attr in inspect(model).column_attrs)
+
+DECK_COLUMNS = _column_names(Deck)
+DECK_CARD_COLUMNS = _column_names(DeckCard)
+CARD_COLUMNS = _column_names(Card)
+
+def _columns(model, names):
+    return [getattr(model, name) for name in names]
+
+class _Row:
+    """Row of column values, assigned to slots in COLUMNS order."""
+
+    __slots__ = ()
+    COLUMNS = ()
+
+    def __init__(self, values):
+        for name, value in zip(self.COLUMNS, values):
+            setattr(self, name, value)
+
+class CardRow(_Row):
+    """Read-only card."""
+
+    __slots__ = CARD_COLUMNS
+    COLUMNS = CARD_COLUMNS
+    to_dict = Card.to_dict
+
+class DeckCardRow(_Row):
+    """Read-only deck card with its card (None if the card row is missing)."""
+
+    __slots__ = DECK_CARD_COLUMNS + ('card',)
+    COLUMNS = DECK_CARD_COLUMNS
+    to_dict = DeckCard.to_dict
+
+    def __init__(self, values, card):
+        super().__init__(values)
+        self.card = card
+
+class DeckRow(_Row):
+    """Read-only deck; cards is None unless they were loaded."""
+
+    __slots__ = DECK_COLUMNS + ('cards',)
+    COLUMNS = DECK_COLUMNS
+    to_dict = Deck.to_dict
+
+    def __init__(self, values, cards=None):
+        super().__init__(values)
+        self.cards = cards
+
+DeckSummary = namedtuple('DeckSummary', ['id', 'name', 'color_identity'])
+
+def load_deck(deck_id, include_cards=True):
+    """
+    Load a deck, and optionally its cards, with one query.
+
+    Cards are in deck card ID order, as with Deck.cards.
+
+    Args:
+        deck_id: Deck ID
+        include_cards: Also load the deck cards and their card data
+
+    Returns:
+        DeckRow, or None if the deck does not exist
+    """
+    if not include_cards:
+        row = db.session.execute(
+            select(*_columns(Deck, DECK_COLUMNS)).where(Deck.id == deck_id)
+        ).first()
+        return DeckRow(row) if row is not None else None
+
+    deck_end = len(DECK_COLUMNS)
+    card_start = deck_end + len(DECK_CARD_COLUMNS)
+    stmt = (
+        select(
+            *_columns(Deck, DECK_COLUMNS),
+            *_columns(DeckCard, DECK_CARD_COLUMNS),
+            *_columns(Card, CARD_COLUMNS)
+        )
+        .select_from(Deck)
+        .outerjoin(DeckCard, DeckCard.deck_id == Deck.id)
+        .outerjoin(Card, Card.id == DeckCard.card_id)
+        .where(Deck.id == deck_id)
+        .order_by(DeckCard.id)
+    )
+
+    deck = None
+    for row in db.session.execute(stmt):
+        if deck is None:
+            deck = DeckRow(row[:deck_end], cards=[])
+        if row[deck_end] is None:
+            continue  # deck without cards
+        card = CardRow(row[card_start:]) if row[card_start] is not None else None
+        deck.cards.append(DeckCardRow(row[deck_end:card_start], card))
+    return deck
+
+def list_decks():
+    """
+    Load every deck with its card count in one aggregate query.
+
+    Returns:
+        List of (DeckRow, card count) in deck ID order
+    """
+    stmt = (
+        select(*_columns(Deck, DECK_COLUMNS), func.coalesce(func.sum(DeckCard.quantity), 0))
+        .select_from(Deck)
+        .outerjoin(DeckCard, DeckCard.deck_id == Deck.id)
+        .group_by(Deck.id)
+        .order_by(Deck.id)
+    )
+    return [(DeckRow(row[:-1]), row[-1]) for row in db.session.execute(stmt)]
+
+def deck_summaries():
+    """ID, name and color identity of every deck, in deck ID order."""
+    stmt = select(Deck.id, Deck.name, Deck.color_identity).order_by(Deck.id)
+    return [DeckSummary(*row) for row in db.session.execute(stmt)]
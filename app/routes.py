@@ -2,17 +2,41 @@
 API routes and view endpoints for MTG Commander Deck Builder.
 """
 
-from flask import Blueprint, request, jsonify, render_template
+from flask import (
+    Blueprint, Response, request, jsonify, render_template, current_app, stream_with_context, url_for,
+    abort
+)
 from app import db
-from app.models import Deck, Card, DeckCard
+from app.models import Deck, Card, Job, parse_fields, select_fields
 from app.scryfall_service import scryfall_service
-from app.deck_validator import validate_deck
+from app.card_search import search_local_cards, UnsupportedQueryError
+from app.name_index import card_name_index
+from app.printings import get_printings
+from app.database import upsert_cards, bulk_data_loaded, get_deck_stats_cached
+from app.deck_validator import validate_deck_cached
+from app.incremental_validator import incremental_validator
+from app.card_attributes import identity_mask, mask_colors
 from app.challenge_validator import validate_challenge, get_challenge_progress
+from app.query_budget import query_budget
+from app.card_usage import release_deck
+from app.deck_editor import DeckEditor, DeckEditError
+from app.decklist_import import parse_decklist
+from app.jobs import job_runner
+from app.etags import conditional, deck_etag, decks_etag
+from app.read_models import load_deck, list_decks
+from app.deck_export import EXPORT_FORMATS, ZIP_CONTENT_TYPE, stream_export, stream_zip, deck_filename
 
 # Create blueprints
 main_bp = Blueprint('main', __name__)
 api_bp = Blueprint('api', __name__)
 
+def load_deck_row_or_404(deck_id, include_cards=True):
+    """Load a read-only deck (with its cards and their card data) in one query."""
+    deck = load_deck(deck_id, include_cards=include_cards)
+    if deck is None:
+        abort(404)
+    return deck
+
 # ============================================================================
 # MAIN ROUTES (HTML pages)
 # ============================================================================
@@ -43,14 +67,35 @@ def challenge_rules():
 
 @api_bp.route('/cards/search', methods=['GET'])
 def search_cards():
-    """Search for cards using Scryfall API."""
+    """Search for cards, locally when possible and through Scryfall otherwise."""
     query = request.args.get('q', '')
     page = request.args.get('page', 1, type=int)
+    deck_id = request.args.get('deck_id', type=int)
 
     if not query:
         return jsonify({'error': 'Query parameter required'}), 400
 
+    # Optionally restrict results to a deck's legal pool (its color identity)
+    pool_mask = None
+    if deck_id is not None:
+        deck = db.session.get(Deck, deck_id)
+        if deck is None:
+            return jsonify({'error': 'Deck not found'}), 404
+        pool_mask = identity_mask(deck)
+
+    # Answer from the local cards table once bulk data has been imported
+    # (until then it only holds cards fetched so far), unless the syntax is unsupported
+    if current_app.config['LOCAL_CARD_SEARCH'] and bulk_data_loaded():
+        try:
+            return jsonify(search_local_cards(
+                query, page, current_app.config['CARDS_PER_PAGE'], identity_mask=pool_mask
+            ))
+        except UnsupportedQueryError:
+            pass
+
     # Search Scryfall
+    if pool_mask is not None:
+        query = f'({query}) id<={mask_colors(pool_mask) or "C"}'
     results = scryfall_service.search_cards(query, page)
 
     if not results:
@@ -59,21 +104,9 @@ def search_cards():
     if 'data' not in results:
         return jsonify({'error': 'No results found'}), 404
 
-    # Store cards in database
-    cards = []
-    for card_data in results['data']:
-        parsed = scryfall_service.parse_card_data(card_data)
-        if parsed:
-            # Check if card exists, update or create
-            card = Card.query.get(parsed['id'])
-            if not card:
-                card = Card(**parsed)
-                db.session.add(card)
-            else:
-                for key, value in parsed.items():
-                    setattr(card, key, value)
-            cards.append(card.to_dict())
-
+    # Store cards in database with a single upsert
+    cards = [p for p in (scryfall_service.parse_card_data(c) for c in results['data']) if p]
+    upsert_cards(cards)
     db.session.commit()
 
     return jsonify({
@@ -84,7 +117,8 @@ def search_cards():
 
 @api_bp.route('/cards/<card_id>', methods=['GET'])
 def get_card(card_id):
-    """Get details for a specific card."""
+    """Get details for a specific card (?fields= limits the fields returned)."""
+    fields = parse_fields(request.args.get('fields'))
     card = Card.query.get(card_id)
 
     if not card:
@@ -92,18 +126,18 @@ def get_card(card_id):
         card_data = scryfall_service.get_card_by_id(card_id)
         if card_data:
             parsed = scryfall_service.parse_card_data(card_data)
-            card = Card(**parsed)
-            db.session.add(card)
+            upsert_cards([parsed])
             db.session.commit()
+            return jsonify(select_fields(parsed, fields))
         else:
             return jsonify({'error': 'Card not found'}), 404
 
-    return jsonify(card.to_dict())
+    return jsonify(card.to_dict(fields))
 
 @api_bp.route('/cards/<card_name>/printings', methods=['GET'])
 def get_card_printings(card_name):
     """Get all printings of a card."""
-    printings = scryfall_service.get_all_printings(card_name)
+    printings = get_printings(card_name)
 
     if not printings:
         return jsonify({'error': 'No printings found'}), 404
@@ -118,29 +152,56 @@ def autocomplete_cards():
     if not query or len(query) < 2:
         return jsonify({'suggestions': []})
 
-    suggestions = scryfall_service.autocomplete(query)
+    # Answer from the local name index. Until bulk data has been imported it
+    # only knows the cards fetched so far, so top up a short list from Scryfall.
+    limit = current_app.config['AUTOCOMPLETE_LIMIT']
+    suggestions = card_name_index.search(query, limit)
+    if len(suggestions) < limit and not bulk_data_loaded():
+        known = set(suggestions)
+        suggestions += [name for name in scryfall_service.autocomplete(query) if name not in known]
+        suggestions = suggestions[:limit]
     return jsonify({'suggestions': suggestions})
 
+@api_bp.route('/scryfall/stats', methods=['GET'])
+def scryfall_stats():
+    """Get Scryfall client statistics (rate limiter throttling)."""
+    return jsonify(scryfall_service.get_stats())
+
 # ============================================================================
 # API ROUTES - Decks
 # ============================================================================
 
 @api_bp.route('/decks', methods=['GET'])
+@query_budget(2)
+@conditional(decks_etag)
 def get_decks():
-    """Get all decks."""
-    decks = Deck.query.all()
-    return jsonify({'decks': [d.to_dict(include_cards=False) for d in decks]})
+    """Get all decks (?fields= limits the fields returned)."""
+    fields = parse_fields(request.args.get('fields'))
+
+    # Card counts come from one aggregate query instead of loading each deck's cards
+    rows = list_decks()
+    return jsonify({'decks': [
+        d.to_dict(include_cards=False, card_count=count, fields=fields) for d, count in rows
+    ]})
 
 @api_bp.route('/decks/<int:deck_id>', methods=['GET'])
+@query_budget(2)
+@conditional(deck_etag)
 def get_deck(deck_id):
-    """Get details for a specific deck."""
-    deck = Deck.query.get_or_404(deck_id)
+    """
+    Get details for a specific deck.
+
+    ?fields= limits the fields returned, with dots for nested fields
+    (e.g. 'name,cards.quantity,cards.card.name,validation').
+    """
+    fields = parse_fields(request.args.get('fields'))
+    deck = load_deck_row_or_404(deck_id)
 
-    deck_dict = deck.to_dict(include_cards=True)
+    deck_dict = deck.to_dict(include_cards=True, fields=fields)
 
-    # Add validation results
-    validation = validate_deck(deck)
-    deck_dict['validation'] = validation
+    # Add validation results (memoized per deck revision)
+    if fields is None or 'validation' in fields:
+        deck_dict['validation'] = validate_deck_cached(deck)
 
     return jsonify(deck_dict)
 
@@ -185,6 +246,9 @@ def update_deck(deck_id):
     if 'commander_name' in data:
         deck.commander_name = data['commander_name']
 
+    old_revision = deck.revision
+    Deck.bump_revision(deck_id)
+    incremental_validator.apply(deck, old_revision)
     db.session.commit()
     return jsonify(deck.to_dict())
 
@@ -192,8 +256,10 @@ def update_deck(deck_id):
 def delete_deck(deck_id):
     """Delete a deck."""
     deck = Deck.query.get_or_404(deck_id)
+    release_deck(deck_id)
     db.session.delete(deck)
     db.session.commit()
+    incremental_validator.discard(deck_id)
     return jsonify({'message': 'Deck deleted'}), 200
 
 # ============================================================================
@@ -209,211 +275,202 @@ def add_card_to_deck(deck_id):
     if not data or 'card_id' not in data:
         return jsonify({'error': 'card_id required'}), 400
 
-    card = Card.query.get(data['card_id'])
-    if not card:
-        return jsonify({'error': 'Card not found'}), 404
+    editor = DeckEditor(deck)
+    try:
+        deck_card = editor.add(data)
+        editor.commit()
+    except DeckEditError as e:
+        db.session.rollback()
+        return jsonify(e.to_dict()), e.status
 
-    # Check if card already in deck
-    existing = DeckCard.query.filter_by(
-        deck_id=deck_id,
-        card_id=data['card_id']
-    ).first()
+    return jsonify(deck_card.to_dict()), 201
 
-    if existing:
-        return jsonify({'error': 'Card already in deck'}), 400
-
-    # Determine if this should be the commander
-    is_commander = data.get('is_commander', False)
-    if not is_commander and card.is_legal_commander:
-        # Check if deck doesn't have a commander yet
-        existing_commander = DeckCard.query.filter_by(
-            deck_id=deck_id,
-            is_commander=True
-        ).first()
-        if not existing_commander:
-            is_commander = True
-
-    deck_card = DeckCard(
-        deck_id=deck_id,
-        card_id=data['card_id'],
-        quantity=data.get('quantity', 1),
-        is_commander=is_commander,
-        category=data.get('category'),
-        selected_printing_id=data.get('selected_printing_id', data['card_id']),
-        selected_image_url=data.get('selected_image_url', card.image_url),
-        selected_set_code=data.get('selected_set_code', card.set_code),
-        selected_collector_number=data.get('selected_collector_number', card.collector_number)
-    )
+@api_bp.route('/decks/<int:deck_id>/cards', methods=['PATCH'])
+def batch_update_deck_cards(deck_id):
+    """
+    Apply a list of add/update/remove operations to a deck in one transaction.
 
-    # Update deck commander info if this is the commander
-    if is_commander:
-        deck.commander_id = data['card_id']
-        deck.commander_name = card.name
+    Either every operation is applied or none is; errors name the failing
+    operation by its index.
+    """
+    deck = Deck.query.get_or_404(deck_id)
+    data = request.get_json()
+    operations = data.get('operations') if isinstance(data, dict) else None
 
-    db.session.add(deck_card)
-    db.session.commit()
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations required'}), 400
 
-    return jsonify(deck_card.to_dict()), 201
+    editor = DeckEditor(deck, preload=True)
+    try:
+        editor.apply(operations)
+        editor.commit()
+    except DeckEditError as e:
+        db.session.rollback()
+        return jsonify(e.to_dict()), e.status
+
+    return jsonify({
+        'applied': len(operations),
+        'revision': deck.revision,
+        'validation': validate_deck_cached(deck)
+    })
 
 @api_bp.route('/decks/<int:deck_id>/cards/<card_id>', methods=['PUT'])
 def update_deck_card(deck_id, card_id):
     """Update card properties in a deck (quantity, print selection)."""
-    deck_card = DeckCard.query.filter_by(
-        deck_id=deck_id,
-        card_id=card_id
-    ).first_or_404()
-
+    deck = Deck.query.get_or_404(deck_id)
     data = request.get_json()
 
-    if 'quantity' in data:
-        deck_card.quantity = data['quantity']
-    if 'category' in data:
-        deck_card.category = data['category']
-    if 'selected_printing_id' in data:
-        deck_card.selected_printing_id = data['selected_printing_id']
-    if 'selected_image_url' in data:
-        deck_card.selected_image_url = data['selected_image_url']
-    if 'selected_set_code' in data:
-        deck_card.selected_set_code = data['selected_set_code']
-    if 'selected_collector_number' in data:
-        deck_card.selected_collector_number = data['selected_collector_number']
-
-    db.session.commit()
+    editor = DeckEditor(deck)
+    try:
+        deck_card = editor.update(card_id, data or {})
+        editor.commit()
+    except DeckEditError as e:
+        db.session.rollback()
+        return jsonify(e.to_dict()), e.status
 
     return jsonify(deck_card.to_dict())
 
 @api_bp.route('/decks/<int:deck_id>/cards/<card_id>', methods=['DELETE'])
 def remove_card_from_deck(deck_id, card_id):
     """Remove a card from a deck."""
-    deck_card = DeckCard.query.filter_by(
-        deck_id=deck_id,
-        card_id=card_id
-    ).first_or_404()
-
-    # If removing commander, clear deck commander info
-    if deck_card.is_commander:
-        deck = Deck.query.get(deck_id)
-        if deck:
-            deck.commander_id = None
-            deck.commander_name = None
-
-    db.session.delete(deck_card)
-    db.session.commit()
+    deck = Deck.query.get_or_404(deck_id)
+
+    editor = DeckEditor(deck)
+    try:
+        editor.remove(card_id)
+        editor.commit()
+    except DeckEditError as e:
+        db.session.rollback()
+        return jsonify(e.to_dict()), e.status
 
     return jsonify({'message': 'Card removed from deck'}), 200
 
 @api_bp.route('/decks/<int:deck_id>/validate', methods=['GET'])
+@query_budget(2)
 def validate_deck_endpoint(deck_id):
     """Validate a deck against Commander rules."""
+    # Cards are only read when no incremental state exists for this revision
     deck = Deck.query.get_or_404(deck_id)
-    validation = validate_deck(deck)
+    validation = validate_deck_cached(deck)
     return jsonify(validation)
 
+@api_bp.route('/decks/<int:deck_id>/stats', methods=['GET'])
+@query_budget(2)
+def get_deck_stats_endpoint(deck_id):
+    """Get type counts, average CMC, mana curve and colors for a deck."""
+    deck = Deck.query.get_or_404(deck_id)
+    return jsonify(get_deck_stats_cached(deck))
+
 # ============================================================================
 # API ROUTES - Challenge
 # ============================================================================
 
 @api_bp.route('/challenge/status', methods=['GET'])
+@query_budget(4)
+@conditional(decks_etag)
 def challenge_status():
     """Get 32 deck challenge status."""
     status = validate_challenge()
     return jsonify(status)
 
 @api_bp.route('/challenge/progress', methods=['GET'])
+@query_budget(1)
 def challenge_progress():
     """Get detailed progress for each color combination."""
     progress = get_challenge_progress()
     return jsonify(progress)
 
+# ============================================================================
+# API ROUTES - Jobs
+# ============================================================================
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get a background job's status, progress and per-item results."""
+    job = Job.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
 # ============================================================================
 # API ROUTES - Import/Export
 # ============================================================================
 
 @api_bp.route('/decks/<int:deck_id>/import', methods=['POST'])
 def import_decklist(deck_id):
-    """Import a decklist from text format."""
-    deck = Deck.query.get_or_404(deck_id)
+    """
+    Import a decklist from text format.
+
+    The import runs as a background job; poll the returned status URL for
+    progress and per-line results.
+    """
+    Deck.query.get_or_404(deck_id)
     data = request.get_json()
 
     if not data or 'decklist' not in data:
         return jsonify({'error': 'decklist required'}), 400
 
-    lines = data['decklist'].strip().split('\n')
-    added = []
-    errors = []
-
-    for line in lines:
-        line = line.strip()
-        if not line or line.startswith('#') or line.startswith('//'):
-            continue
-
-        # Parse line (format: "1 Card Name" or "Card Name")
-        parts = line.split(' ', 1)
-        if len(parts) == 2 and parts[0].isdigit():
-            quantity = int(parts[0])
-            card_name = parts[1]
-        else:
-            quantity = 1
-            card_name = line
-
-        # Search for card
-        card_data = scryfall_service.get_card_by_name(card_name, exact=True)
-        if card_data:
-            parsed = scryfall_service.parse_card_data(card_data)
-            card = Card.query.get(parsed['id'])
-            if not card:
-                card = Card(**parsed)
-                db.session.add(card)
-                db.session.flush()
-
-            # Add to deck
-            deck_card = DeckCard(
-                deck_id=deck_id,
-                card_id=card.id,
-                quantity=quantity,
-                selected_printing_id=card.id,
-                selected_image_url=card.image_url,
-                selected_set_code=card.set_code,
-                selected_collector_number=card.collector_number
-            )
-            db.session.add(deck_card)
-            added.append(card_name)
-        else:
-            errors.append(f"Card not found: {card_name}")
-
-    db.session.commit()
+    entries = parse_decklist(data['decklist'])
+    job = job_runner.submit('import_decklist', deck_id, entries, total=len(entries), deck_id=deck_id)
 
     return jsonify({
-        'added': len(added),
-        'errors': errors,
-        'cards': added
-    })
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('api.get_job', job_id=job.id)
+    }), 202
 
 @api_bp.route('/decks/<int:deck_id>/export', methods=['GET'])
+@query_budget(2)
 def export_decklist(deck_id):
-    """Export a deck as text."""
-    deck = Deck.query.get_or_404(deck_id)
+    """Export a deck as text, Arena, MTGO .dek, JSON Lines or JSON."""
     format_type = request.args.get('format', 'text')
 
     if format_type == 'json':
+        deck = load_deck_row_or_404(deck_id)
         deck_dict = deck.to_dict(include_cards=True)
         return jsonify(deck_dict)
 
-    # Text format
-    lines = [f"# {deck.name}", f"# Commander: {deck.commander_name or 'None'}", ""]
-
-    # Group by category or type
-    commander = [dc for dc in deck.cards if dc.is_commander]
-    other = [dc for dc in deck.cards if not dc.is_commander]
-
-    if commander:
-        lines.append("Commander:")
-        for dc in commander:
-            lines.append(f"1 {dc.card.name}")
-        lines.append("")
-
-    lines.append("Deck:")
-    for dc in sorted(other, key=lambda x: x.card.name):
-        lines.append(f"{dc.quantity} {dc.card.name}")
-
-    return '\n'.join(lines), 200, {'Content-Type': 'text/plain'}
+    if format_type not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported format: {format_type}'}), 400
+
+    deck = load_deck_row_or_404(deck_id, include_cards=False)
+    content_type, extension = EXPORT_FORMATS[format_type]
+    body = ''.join(stream_export(format_type, [deck_id]))
+    headers = {'Content-Type': content_type}
+    if format_type == 'dek':
+        headers['Content-Disposition'] = f'attachment; filename="{deck_filename(deck, extension)}"'
+    return body, 200, headers
+
+@api_bp.route('/export', methods=['GET'])
+def export_decks():
+    """
+    Stream many decks in one response (all decks unless ?decks=1,2,... is given).
+
+    ?format= is text, arena, jsonl or zip; a zip holds one file per deck in
+    the ?files= format (text, arena, dek or jsonl; default dek).
+    """
+    format_type = request.args.get('format', 'text')
+    deck_ids = None
+    if request.args.get('decks'):
+        try:
+            deck_ids = [int(d) for d in request.args['decks'].split(',') if d.strip()]
+        except ValueError:
+            return jsonify({'error': 'decks must be a comma-separated list of deck IDs'}), 400
+
+    if format_type == 'zip':
+        file_format = request.args.get('files', 'dek')
+        if file_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'Unsupported format: {file_format}'}), 400
+        return Response(
+            stream_with_context(stream_zip(file_format, deck_ids)),
+            mimetype=ZIP_CONTENT_TYPE,
+            headers={'Content-Disposition': 'attachment; filename="edh-challenge-decks.zip"'}
+        )
+
+    if format_type == 'dek' or format_type not in EXPORT_FORMATS:
+        message = ('MTGO .dek files hold one deck; use format=zip&files=dek'
+                   if format_type == 'dek' else f'Unsupported format: {format_type}')
+        return jsonify({'error': message}), 400
+
+    return Response(
+        stream_with_context(stream_export(format_type, deck_ids)),
+        content_type=EXPORT_FORMATS[format_type][0]
+    )
@@ -3,32 +3,136 @@ Scryfall API integration service.
 Handles all interactions with the Scryfall API for card data.
 """
 
+import json
+import os
 import requests
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
+from requests.adapters import HTTPAdapter
+from sqlalchemy import or_
+from app.models import Card
+from app.name_index import card_name_index
+from app.database import upsert_cards
+from app.rate_limiter import TokenBucket
+from app.cache import TieredCache, SingleFlight, MISSING
+from app.card_attributes import color_mask, type_flags
+
+# Maximum identifiers accepted by a single /cards/collection request
+COLLECTION_BATCH_SIZE = 75
+
+def _instance_file(app, path):
+    """Resolve a relative file path against the application's instance folder."""
+    if path and not os.path.isabs(path):
+        os.makedirs(app.instance_path, exist_ok=True)
+        path = os.path.join(app.instance_path, path)
+    return path
 
 class ScryfallService:
     """Service for interacting with Scryfall API."""
 
     def __init__(self):
         self.base_url = 'https://api.scryfall.com'
-        self.last_request_time = 0
         self.rate_limit = 0.1  # 10 requests per second
+        self.max_workers = 4
+        self.rate_limiter = TokenBucket(rate=1 / self.rate_limit, name='scryfall')
+        self.cache = TieredCache()
+        self.cache_ttls = {}
+        self.in_flight = SingleFlight()
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._executor = None
+
+    def init_app(self, app):
+        """Configure the service from the application config."""
+        self.base_url = app.config.get('SCRYFALL_API_BASE', self.base_url)
+        self.rate_limit = app.config.get('SCRYFALL_RATE_LIMIT', self.rate_limit)
+        self.max_workers = app.config.get('SCRYFALL_MAX_WORKERS', self.max_workers)
+
+        # Share the request budget with every worker process on this host
+        self.rate_limiter = TokenBucket(
+            rate=1 / self.rate_limit,
+            capacity=app.config.get('SCRYFALL_RATE_BURST', 1),
+            path=_instance_file(app, app.config.get('SCRYFALL_RATE_LIMIT_DB')),
+            name='scryfall'
+        )
+
+        self.cache = TieredCache(
+            memory_entries=app.config.get('SCRYFALL_CACHE_MEMORY_ENTRIES', 256),
+            disk_path=_instance_file(app, app.config.get('SCRYFALL_CACHE_DB')),
+            disk_entries=app.config.get('SCRYFALL_CACHE_DISK_ENTRIES', 10000)
+        )
+        self.cache_ttls = app.config.get('SCRYFALL_CACHE_TTLS', {})
+
+    @property
+    def session(self):
+        """Shared keep-alive HTTP session, created on first use."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers.update({
+                        'User-Agent': 'EDHChallenge/1.2',
+                        'Accept': 'application/json'
+                    })
+                    self._session = session
+        return self._session
 
     def _rate_limit_wait(self):
-        """Ensure we don't exceed Scryfall's rate limits."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.rate_limit:
-            time.sleep(self.rate_limit - time_since_last)
-        self.last_request_time = time.time()
-
-    def _make_request(self, endpoint, params=None):
-        """Make a request to Scryfall API with rate limiting."""
+        """Ensure we don't exceed Scryfall's rate limits. Returns seconds waited."""
+        waited = self.rate_limiter.acquire()
+        if waited and current_app:
+            current_app.logger.debug(f"Scryfall rate limit: waited {waited:.3f}s")
+        return waited
+
+    def get_stats(self):
+        """Return runtime statistics for the Scryfall client."""
+        return {
+            'rate_limiter': self.rate_limiter.stats(),
+            'cache': self.cache.stats(),
+            'coalescing': self.in_flight.stats()
+        }
+
+    def _cache_ttl(self, endpoint):
+        """Return the cache TTL in seconds for an endpoint (longest matching prefix)."""
+        best = None
+        for prefix in self.cache_ttls:
+            if endpoint.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return self.cache_ttls[best] if best is not None else 0
+
+    def _make_request(self, endpoint, params=None, payload=None):
+        """
+        Make a request to Scryfall API with caching and rate limiting.
+
+        GET responses are cached per endpoint and params; concurrent identical
+        GETs share one outstanding request, and when Scryfall fails an expired
+        cached response is served instead. Requests with a payload are sent as
+        uncached POSTs.
+        """
+        ttl = self._cache_ttl(endpoint) if payload is None else 0
+        if not ttl:
+            return self._send_request(endpoint, params, payload)
+
+        cache_key = f"{endpoint}?{json.dumps(params or {}, sort_keys=True)}"
+        cached = self.cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+
+        return self.in_flight.do(cache_key, lambda: self._fetch_cached(cache_key, ttl, endpoint, params))
+
+    def _send_request(self, endpoint, params=None, payload=None):
+        """Send one rate-limited request to Scryfall (POST when a payload is given)."""
         self._rate_limit_wait()
         url = f"{self.base_url}{endpoint}"
         try:
-            response = requests.get(url, params=params, timeout=10)
+            if payload is not None:
+                response = self.session.post(url, json=payload, timeout=10)
+            else:
+                response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -36,6 +140,63 @@ class ScryfallService:
                 current_app.logger.error(f"Scryfall API error: {str(e)}")
             return None
 
+    def _fetch_cached(self, cache_key, ttl, endpoint, params):
+        """Fetch a cacheable GET, storing the result or falling back to a stale entry."""
+        result = self._send_request(endpoint, params)
+        if result is not None:
+            self.cache.set(cache_key, result, ttl)
+            return result
+
+        stale = self.cache.get(cache_key, allow_stale=True)
+        return stale if stale is not MISSING else None
+
+    def _get_executor(self):
+        """Bounded thread pool for concurrent requests, created on first use."""
+        if self._executor is None:
+            with self._session_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='scryfall'
+                    )
+        return self._executor
+
+    def submit(self, endpoint, params=None, payload=None):
+        """
+        Start a request on the thread pool without waiting for it.
+
+        Returns:
+            concurrent.futures.Future resolving to the request result
+        """
+        app = current_app._get_current_object() if current_app else None
+
+        def run():
+            if app is None:
+                return self._make_request(endpoint, params, payload)
+            with app.app_context():
+                return self._make_request(endpoint, params, payload)
+
+        return self._get_executor().submit(run)
+
+    def fetch_many(self, endpoints):
+        """
+        Issue several requests concurrently on a bounded thread pool.
+
+        Requests still pass through the rate limiter, so they start no faster
+        than the configured rate but overlap while in flight.
+
+        Args:
+            endpoints: List of endpoint strings or (endpoint, params[, payload]) tuples
+
+        Returns:
+            List of results (None for failed requests) in the same order
+        """
+        futures = [
+            self.submit(args) if isinstance(args, str) else self.submit(*args)
+            for args in endpoints
+        ]
+        return [future.result() for future in futures]
+
     def search_cards(self, query, page=1, unique='cards'):
         """
         Search for cards using Scryfall syntax.
@@ -72,9 +233,134 @@ class ScryfallService:
         else:
             return self._make_request('/cards/named', {'fuzzy': card_name})
 
+    def get_cards_collection(self, identifiers):
+        """
+        Fetch up to 75 cards in a single request.
+
+        Args:
+            identifiers: List of Scryfall card identifiers (e.g. {'name': ...})
+
+        Returns:
+            Dictionary with 'data' and 'not_found' lists
+        """
+        return self._make_request('/cards/collection', payload={'identifiers': identifiers})
+
+    def resolve_card_names(self, card_names):
+        """
+        Resolve many card names at once.
+
+        Names are first looked up in the local cards table with a single indexed
+        query, matching full names case-insensitively and face names of
+        multi-face cards through the card name index; the misses are fetched from Scryfall's collection endpoint in batches
+        and added to the session (the caller is responsible for committing).
+
+        Args:
+            card_names: Iterable of card names
+
+        Returns:
+            Tuple of (dict mapping each resolved name to its Card, list of unresolved names)
+        """
+        names = list(dict.fromkeys(n for n in card_names if n))
+        resolved = {}
+
+        # Local lookup in one query: each name as typed (NOCASE index) or the
+        # stored names it matches as a full or face name (name index)
+        candidates = {name: [name] + card_name_index.names_for(name) for name in names}
+        stored_names = {full for options in candidates.values() for full in options[1:]}
+        if names:
+            by_lower = {}
+            for card in Card.query.filter(or_(
+                Card.name.collate('NOCASE').in_(names),
+                Card.name.in_(stored_names)
+            )):
+                by_lower.setdefault(card.name.lower(), card)
+            for name, options in candidates.items():
+                for option in options:
+                    card = by_lower.get(option.lower())
+                    if card is not None:
+                        resolved[name] = card
+                        break
+
+        missing = [n for n in names if n not in resolved]
+
+        # Remote lookup for the misses, 75 identifiers per request, fetched concurrently
+        fetched_ids = {}
+        chunks = [missing[i:i + COLLECTION_BATCH_SIZE] for i in range(0, len(missing), COLLECTION_BATCH_SIZE)]
+        results = self.fetch_many([
+            ('/cards/collection', None, {'identifiers': [{'name': n} for n in chunk]})
+            for chunk in chunks
+        ])
+
+        for chunk, result in zip(chunks, results):
+            if not result:
+                continue
+
+            parsed_cards = []
+            for card_data in result.get('data', []):
+                parsed = self.parse_card_data(card_data)
+                if not parsed:
+                    continue
+                parsed_cards.append(parsed)
+
+                # Match on the full name and on each face name
+                aliases = {card_data.get('name', '').lower()}
+                aliases.update(face.get('name', '').lower() for face in card_data.get('card_faces', []))
+                for name in chunk:
+                    if name.lower() in aliases and name not in fetched_ids:
+                        fetched_ids[name] = parsed['id']
+
+            upsert_cards(parsed_cards)
+
+        if fetched_ids:
+            cards = {c.id: c for c in Card.query.filter(Card.id.in_(set(fetched_ids.values()))).all()}
+            for name, card_id in fetched_ids.items():
+                if card_id in cards:
+                    resolved[name] = cards[card_id]
+
+        not_found = [n for n in names if n not in resolved]
+        return resolved, not_found
+
+    def parse_printing_data(self, card_data):
+        """
+        Parse Scryfall card data into a printing record.
+
+        Args:
+            card_data: Raw card data from Scryfall
+
+        Returns:
+            Dictionary with printing details
+        """
+        printing = {
+            'id': card_data.get('id'),
+            'oracle_id': card_data.get('oracle_id'),
+            'name': card_data.get('name'),
+            'set_code': card_data.get('set'),
+            'set_name': card_data.get('set_name'),
+            'collector_number': card_data.get('collector_number'),
+            'rarity': card_data.get('rarity'),
+            'released_at': card_data.get('released_at'),
+            'image_url': None,
+            'image_url_small': None
+        }
+
+        # Get image URLs
+        if 'image_uris' in card_data:
+            printing['image_url'] = card_data['image_uris'].get('normal')
+            printing['image_url_small'] = card_data['image_uris'].get('small')
+        elif 'card_faces' in card_data and card_data['card_faces']:
+            first_face = card_data['card_faces'][0]
+            if 'image_uris' in first_face:
+                printing['image_url'] = first_face['image_uris'].get('normal')
+                printing['image_url_small'] = first_face['image_uris'].get('small')
+
+        return printing
+
     def get_all_printings(self, card_name):
         """
-        Get all printings of a card by name.
+        Get all printings of a card by name, following every result page.
+
+        The next page is requested in the background while the current one
+        is being parsed.
 
         Args:
             card_name: Name of the card
@@ -85,33 +371,17 @@ class ScryfallService:
         # Search for all prints of this card
         result = self.search_cards(f'!"{card_name}"', unique='prints')
 
-        if not result or 'data' not in result:
-            return []
-
         printings = []
-        for card_data in result['data']:
-            printing = {
-                'id': card_data.get('id'),
-                'name': card_data.get('name'),
-                'set_code': card_data.get('set'),
-                'set_name': card_data.get('set_name'),
-                'collector_number': card_data.get('collector_number'),
-                'rarity': card_data.get('rarity'),
-                'image_url': None,
-                'image_url_small': None
-            }
-
-            # Get image URLs
-            if 'image_uris' in card_data:
-                printing['image_url'] = card_data['image_uris'].get('normal')
-                printing['image_url_small'] = card_data['image_uris'].get('small')
-            elif 'card_faces' in card_data and card_data['card_faces']:
-                first_face = card_data['card_faces'][0]
-                if 'image_uris' in first_face:
-                    printing['image_url'] = first_face['image_uris'].get('normal')
-                    printing['image_url_small'] = first_face['image_uris'].get('small')
-
-            printings.append(printing)
+        while result and 'data' in result:
+            next_page = None
+            if result.get('has_more') and result.get('next_page', '').startswith(self.base_url):
+                next_page = self.submit(result['next_page'][len(self.base_url):])
+
+            printings.extend(self.parse_printing_data(card_data) for card_data in result['data'])
+
+            result = next_page.result() if next_page else None
+            if next_page and not result and current_app:
+                current_app.logger.warning(f"Incomplete printings for {card_name}: page fetch failed")
 
         return printings
 
@@ -187,9 +457,11 @@ class ScryfallService:
             'mana_cost': scryfall_data.get('mana_cost', ''),
             'cmc': scryfall_data.get('cmc', 0),
             'type_line': scryfall_data.get('type_line', ''),
+            'type_flags': type_flags(scryfall_data.get('type_line', '')),
             'oracle_text': scryfall_data.get('oracle_text', ''),
             'colors': ','.join(scryfall_data.get('colors', [])),
             'color_identity': ','.join(scryfall_data.get('color_identity', [])),
+            'color_identity_mask': color_mask(','.join(scryfall_data.get('color_identity', []))),
             'power': scryfall_data.get('power'),
             'toughness': scryfall_data.get('toughness'),
             'loyalty': scryfall_data.get('loyalty'),
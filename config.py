@@ -13,9 +13,48 @@ class Config:
     # Scryfall API config
     SCRYFALL_API_BASE = 'https://api.scryfall.com'
     SCRYFALL_RATE_LIMIT = 0.1  # seconds between requests (10 requests per second)
+    SCRYFALL_RATE_BURST = 1  # requests allowed back-to-back before throttling
+    SCRYFALL_MAX_WORKERS = 4  # concurrent in-flight requests (and pooled connections)
+    # SQLite file (relative to the instance folder) sharing the rate limit between processes
+    SCRYFALL_RATE_LIMIT_DB = os.environ.get('SCRYFALL_RATE_LIMIT_DB') or 'scryfall_ratelimit.db'
+
+    # Scryfall response cache (in-memory LRU in front of a SQLite file in the instance folder)
+    SCRYFALL_CACHE_DB = os.environ.get('SCRYFALL_CACHE_DB') or 'scryfall_cache.db'
+    SCRYFALL_CACHE_MEMORY_ENTRIES = 256
+    SCRYFALL_CACHE_DISK_ENTRIES = 20000
+    # TTL in seconds per endpoint prefix (longest prefix wins, 0 disables caching)
+    SCRYFALL_CACHE_TTLS = {
+        '/cards/': 7 * 24 * 3600,  # cards by Scryfall ID
+        '/cards/named': 24 * 3600,
+        '/cards/search': 6 * 3600,
+        '/cards/autocomplete': 24 * 3600,
+        '/cards/random': 0
+    }
+
+    # Answer card searches from the local cards table when the query allows it
+    # (only after import_bulk_data.py has loaded the full card pool)
+    LOCAL_CARD_SEARCH = True
+
+    # Background jobs (decklist imports and other Scryfall-heavy work)
+    JOBS_MAX_WORKERS = 2  # jobs running at once; others wait in the queue
+    JOBS_RUN_INLINE = False  # run jobs in the submitting request (no worker threads)
+    IMPORT_BATCH_SIZE = 25  # decklist lines resolved and committed per batch
+
+    # Response compression (brotli when installed, else gzip)
+    COMPRESS_MIN_SIZE = 1024  # bytes; smaller responses are sent as-is
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIMETYPES = [
+        'application/json', 'application/x-ndjson', 'application/xml',
+        'text/plain', 'text/html', 'text/css', 'application/javascript'
+    ]
 
     # Application config
     CARDS_PER_PAGE = 50
+    AUTOCOMPLETE_LIMIT = 20
+
+    # Raise instead of logging when a read endpoint exceeds its SQL query budget
+    QUERY_BUDGET_STRICT = False
+    PRINTINGS_TTL = 7 * 24 * 3600  # seconds before stored printings are refreshed
     MAX_DECKS = 32
     CARDS_PER_DECK = 100
 
@@ -91,6 +130,10 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SCRYFALL_RATE_LIMIT_DB = None
+    SCRYFALL_CACHE_DB = None
+    QUERY_BUDGET_STRICT = True
+    JOBS_RUN_INLINE = True  # worker threads would not share the in-memory database
 
 class ProductionConfig(Config):
     """Production configuration."""
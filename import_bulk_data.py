@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Scryfall bulk-data import script.
+Streams a downloaded Scryfall bulk-data file (default_cards, oracle_cards, ...)
+into the local cards table so card lookups can be answered from disk.
+
+Usage:
+    python import_bulk_data.py default-cards.json [--batch-size 5000]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from app import create_app, db
+from app.database import upsert_cards
+from app.models import BulkImport
+from app.scryfall_service import scryfall_service
+
+# Layouts that are not real cards and would only pollute search results
+EXCLUDED_LAYOUTS = {'token', 'double_faced_token', 'emblem', 'art_series'}
+
+def iter_json_array(fp, chunk_size=1 << 20):
+    """
+    Yield the elements of a top-level JSON array without loading the whole file.
+
+    Args:
+        fp: Text file object positioned at the start of the array
+        chunk_size: Number of characters to read at a time
+
+    Yields:
+        Decoded array elements
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    index = 0
+    started = False
+    eof = False
+
+    while True:
+        # Skip whitespace and element separators
+        while index < len(buffer) and buffer[index] in ' \t\r\n,':
+            index += 1
+
+        if index >= len(buffer):
+            if eof:
+                raise ValueError('Unexpected end of file while reading JSON array')
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buffer, index = chunk, 0
+            continue
+
+        if not started:
+            if buffer[index] != '[':
+                raise ValueError('Bulk data file must contain a JSON array')
+            started = True
+            index += 1
+            continue
+
+        if buffer[index] == ']':
+            return
+
+        try:
+            obj, index = decoder.raw_decode(buffer, index)
+        except json.JSONDecodeError:
+            # The element straddles a chunk boundary; read more and retry
+            if eof:
+                raise
+            chunk = fp.read(chunk_size)
+            eof = not chunk
+            buffer, index = buffer[index:] + chunk, 0
+            continue
+
+        yield obj
+
+def open_bulk_file(path):
+    """Open a bulk-data file, transparently handling gzip compression."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+def import_bulk_data(path, batch_size=5000, config_name='development'):
+    """Stream a Scryfall bulk-data file into the cards table."""
+    app = create_app(config_name)
+
+    with app.app_context():
+        db.create_all()
+
+        print(f"Importing cards from {path}...")
+        start = time.time()
+        imported = 0
+        skipped = 0
+        batch = []
+
+        with open_bulk_file(path) as fp:
+            for card_data in iter_json_array(fp):
+                if card_data.get('object') != 'card' or card_data.get('layout') in EXCLUDED_LAYOUTS:
+                    skipped += 1
+                    continue
+
+                parsed = scryfall_service.parse_card_data(card_data)
+                if not parsed or not parsed['id'] or not parsed['name']:
+                    skipped += 1
+                    continue
+
+                batch.append(parsed)
+                if len(batch) >= batch_size:
+                    imported += upsert_cards(batch)
+                    db.session.commit()
+                    batch = []
+                    print(f"  {imported} cards imported...")
+
+        if batch:
+            imported += upsert_cards(batch)
+
+        # Local card search is only trusted once a complete import is recorded
+        db.session.add(BulkImport(source=os.path.basename(path), card_count=imported))
+        db.session.commit()
+
+        elapsed = time.time() - start
+        print(f"\n✓ Imported {imported} cards ({skipped} skipped) in {elapsed:.1f}s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import a Scryfall bulk-data file into the local database.')
+    parser.add_argument('path', help='Path to a Scryfall bulk-data JSON file (optionally .gz)')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='Number of cards written per transaction (default: 5000)')
+    args = parser.parse_args()
+
+    import_bulk_data(args.path, args.batch_size, os.environ.get('FLASK_CONFIG', 'development'))
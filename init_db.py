@@ -5,8 +5,17 @@ Run this script to create the database schema.
 """
 
 import os
+from sqlalchemy import text
 from app import create_app, db
-from app.models import Deck, Card, DeckCard
+from app.models import Deck, Card, DeckCard, CardUsage
+from app.card_usage import rebuild_card_usage
+
+def count_rows(table):
+    """
+    Count a table's rows with plain SQL, so databases from earlier versions
+    can be counted before migrate_db.py has added the models' new columns.
+    """
+    return db.session.execute(text(f'SELECT COUNT(*) FROM {table}')).scalar()
 
 def init_database():
     """Initialize the database with schema."""
@@ -18,13 +27,20 @@ def init_database():
         db.create_all()
 
         # Check if we need to populate with initial data
-        deck_count = Deck.query.count()
+        deck_count = count_rows('decks')
         if deck_count == 0:
             print("Database is empty. Ready for use!")
             print("You can now start building your 32 Commander decks!")
         else:
             print(f"Database already contains {deck_count} decks.")
 
+            # Backfill the card usage index for databases created before it existed
+            if count_rows('card_usage') == 0 and count_rows('deck_cards') > 0:
+                print("Building card usage index...")
+                indexed = rebuild_card_usage()
+                db.session.commit()
+                print(f"Indexed {indexed} cards.")
+
         print("\nDatabase initialization complete!")
         print(f"Database location: {app.config['SQLALCHEMY_DATABASE_URI']}")
         print("\nRun 'python run.py' to start the application.")
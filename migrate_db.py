@@ -1,14 +1,66 @@
 #!/usr/bin/env python
 """
-Database migration script to add new columns for print selection.
-Run this if you have an existing database from the previous version.
+Database migration script to add new columns and indexes.
+Run this if you have an existing database from a previous version.
+New tables are created by init_db.py.
 """
 
 import sqlite3
 import os
 
+# (table, column, column definition) added since v1.0
+COLUMN_MIGRATIONS = [
+    ('cards', 'image_url_small', 'VARCHAR(500)'),
+    ('cards', 'collector_number', 'VARCHAR(20)'),
+    ('deck_cards', 'selected_printing_id', 'VARCHAR(50)'),
+    ('deck_cards', 'selected_image_url', 'VARCHAR(500)'),
+    ('deck_cards', 'selected_set_code', 'VARCHAR(10)'),
+    ('deck_cards', 'selected_collector_number', 'VARCHAR(20)'),
+    ('decks', 'revision', 'INTEGER NOT NULL DEFAULT 0'),
+    ('cards', 'color_identity_mask', 'INTEGER'),
+    ('decks', 'color_identity_mask', 'INTEGER'),
+    ('cards', 'type_flags', 'INTEGER'),
+]
+
+# WUBRG bitmask of a color_identity string (see app/card_attributes.py)
+COLOR_MASK_SQL = ' + '.join(
+    f"(instr(coalesce(color_identity, ''), '{color}') > 0) * {bit}"
+    for color, bit in (('W', 1), ('U', 2), ('B', 4), ('R', 8), ('G', 16))
+)
+
+# TYPE_FLAGS bitfield of a type_line string (see app/card_attributes.py)
+TYPE_FLAGS_SQL = ' + '.join(
+    f"(instr(lower(coalesce(type_line, '')), '{name}') > 0) * {bit}"
+    for name, bit in (('creature', 1), ('instant', 2), ('sorcery', 4), ('artifact', 8),
+                      ('enchantment', 16), ('planeswalker', 32), ('land', 64), ('battle', 128))
+)
+
+# Statements filling a newly added column for existing rows
+BACKFILLS = {
+    ('cards', 'color_identity_mask'): f'UPDATE cards SET color_identity_mask = {COLOR_MASK_SQL}',
+    ('decks', 'color_identity_mask'): f'UPDATE decks SET color_identity_mask = {COLOR_MASK_SQL}',
+    ('cards', 'type_flags'): f'UPDATE cards SET type_flags = {TYPE_FLAGS_SQL}',
+}
+
+# (index name, table, column) used by local card search and deck pools
+INDEX_MIGRATIONS = [
+    ('ix_cards_cmc', 'cards', 'cmc'),
+    ('ix_cards_rarity', 'cards', 'rarity'),
+    ('ix_cards_set_code', 'cards', 'set_code'),
+    ('ix_cards_is_legal_commander', 'cards', 'is_legal_commander'),
+    ('ix_cards_color_identity_mask', 'cards', 'color_identity_mask'),
+    ('ix_decks_color_identity_mask', 'decks', 'color_identity_mask'),
+    ('ix_cards_name_nocase', 'cards', 'name COLLATE NOCASE'),
+    ('ix_deck_cards_deck_id_card_id', 'deck_cards', 'deck_id, card_id'),
+]
+
+def get_columns(cursor, table):
+    """Return the set of column names for a table."""
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cursor.fetchall()}
+
 def migrate_database():
-    """Add new columns to existing database."""
+    """Add new columns and indexes to existing database."""
     db_path = 'mtg_commander.db'
 
     if not os.path.exists(db_path):
@@ -21,47 +73,36 @@ def migrate_database():
     cursor = conn.cursor()
 
     try:
-        # Add new columns to cards table
-        print("Adding image_url_small column to cards table...")
-        cursor.execute('''
-            ALTER TABLE cards ADD COLUMN image_url_small VARCHAR(500)
-        ''')
-
-        print("Adding collector_number column to cards table...")
-        cursor.execute('''
-            ALTER TABLE cards ADD COLUMN collector_number VARCHAR(20)
-        ''')
-
-        # Add new columns to deck_cards table
-        print("Adding selected_printing_id column to deck_cards table...")
-        cursor.execute('''
-            ALTER TABLE deck_cards ADD COLUMN selected_printing_id VARCHAR(50)
-        ''')
-
-        print("Adding selected_image_url column to deck_cards table...")
-        cursor.execute('''
-            ALTER TABLE deck_cards ADD COLUMN selected_image_url VARCHAR(500)
-        ''')
-
-        print("Adding selected_set_code column to deck_cards table...")
-        cursor.execute('''
-            ALTER TABLE deck_cards ADD COLUMN selected_set_code VARCHAR(10)
-        ''')
-
-        print("Adding selected_collector_number column to deck_cards table...")
-        cursor.execute('''
-            ALTER TABLE deck_cards ADD COLUMN selected_collector_number VARCHAR(20)
-        ''')
+        changed = False
+
+        for table, column, definition in COLUMN_MIGRATIONS:
+            if column in get_columns(cursor, table):
+                continue
+            print(f"Adding {column} column to {table} table...")
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            if (table, column) in BACKFILLS:
+                cursor.execute(BACKFILLS[(table, column)])
+            changed = True
+
+        for name, table, column in INDEX_MIGRATIONS:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)
+            )
+            if cursor.fetchone():
+                continue
+            print(f"Creating {name} index...")
+            cursor.execute(f'CREATE INDEX {name} ON {table} ({column})')
+            changed = True
 
         conn.commit()
-        print("✓ Migration completed successfully!")
+        if changed:
+            print("✓ Migration completed successfully!")
+        else:
+            print("Database is up to date.")
 
     except sqlite3.OperationalError as e:
-        if 'duplicate column name' in str(e).lower():
-            print("Columns already exist. Database is up to date.")
-        else:
-            print(f"Error during migration: {e}")
-            conn.rollback()
+        print(f"Error during migration: {e}")
+        conn.rollback()
     finally:
         conn.close()
 
@@ -155,7 +155,8 @@ async function addCardToDeck(card, options = {}) {
         await loadDeck();
     } catch (error) {
         console.error('Failed to add card:', error);
-        showNotification('Failed to add card. It may already be in the deck.', 'error');
+        showNotification(error.message !== 'API request failed' ?
+            error.message : 'Failed to add card. It may already be in the deck.', 'error');
     }
 }
 
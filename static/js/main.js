@@ -1,11 +1,36 @@
 // Main JavaScript for MTG Commander Deck Builder
 
+// Build an Error from a failed response, using the server's error message if present
+async function apiError(response) {
+    try {
+        const data = await response.json();
+        if (data && data.error) return new Error(data.error);
+    } catch (e) {
+        // Not a JSON error body
+    }
+    return new Error('API request failed');
+}
+
+// Last payload and ETag per GET endpoint, revalidated with If-None-Match
+const etagCache = new Map();
+
 // API utility functions
 const API = {
     async get(endpoint) {
-        const response = await fetch(`/api${endpoint}`);
-        if (!response.ok) throw new Error('API request failed');
-        return await response.json();
+        const cached = etagCache.get(endpoint);
+        const headers = cached ? {'If-None-Match': cached.etag} : {};
+        const response = await fetch(`/api${endpoint}`, {headers});
+        if (response.status === 304 && cached) return cached.data;
+        if (!response.ok) throw await apiError(response);
+
+        const data = await response.json();
+        const etag = response.headers.get('ETag');
+        if (etag) {
+            etagCache.set(endpoint, {etag, data});
+        } else {
+            etagCache.delete(endpoint);
+        }
+        return data;
     },
 
     async post(endpoint, data) {
@@ -14,7 +39,7 @@ const API = {
             headers: {'Content-Type': 'application/json'},
             body: JSON.stringify(data)
         });
-        if (!response.ok) throw new Error('API request failed');
+        if (!response.ok) throw await apiError(response);
         return await response.json();
     },
 
@@ -24,7 +49,17 @@ const API = {
             headers: {'Content-Type': 'application/json'},
             body: JSON.stringify(data)
         });
-        if (!response.ok) throw new Error('API request failed');
+        if (!response.ok) throw await apiError(response);
+        return await response.json();
+    },
+
+    async patch(endpoint, data) {
+        const response = await fetch(`/api${endpoint}`, {
+            method: 'PATCH',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(data)
+        });
+        if (!response.ok) throw await apiError(response);
         return await response.json();
     },
 
@@ -32,7 +67,7 @@ const API = {
         const response = await fetch(`/api${endpoint}`, {
             method: 'DELETE'
         });
-        if (!response.ok) throw new Error('API request failed');
+        if (!response.ok) throw await apiError(response);
         return await response.json();
     }
 };
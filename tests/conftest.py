@@ -0,0 +1,62 @@
+"""
+Shared fixtures: an app on the in-memory testing database, seeded with a
+complete 32-deck challenge of 100-card decks.
+"""
+
+import pytest
+from app import create_app, db
+from app.database import upsert_cards
+from app.models import Deck, DeckCard
+from app.scryfall_service import scryfall_service
+
+CARDS_PER_DECK = 100
+
+def _card_data(card_id, name, type_line, color_identity=()):
+    return scryfall_service.parse_card_data({
+        'id': card_id,
+        'name': name,
+        'type_line': type_line,
+        'cmc': 2,
+        'colors': list(color_identity),
+        'color_identity': list(color_identity),
+        'legalities': {'commander': 'legal'}
+    })
+
+def seed_challenge(app):
+    """Create one 100-card deck (a commander and 99 other cards) per color combination."""
+    cards = []
+    decks = []
+    for index, code in enumerate(app.config['COLOR_COMBINATIONS']):
+        colors = '' if code == 'C' else code
+        commander = _card_data(f'cmd-{index}', f'Commander {index}', 'Legendary Creature — Elf', colors)
+        others = [
+            _card_data(f'card-{index}-{n}', f'Card {index}-{n}', 'Creature — Elf' if n % 3 else 'Instant')
+            for n in range(CARDS_PER_DECK - 1)
+        ]
+        cards.append(commander)
+        cards.extend(others)
+        decks.append((code, commander, others))
+
+    upsert_cards(cards)
+    for code, commander, others in decks:
+        deck = Deck(name=f'{code} Deck', color_identity=code,
+                    commander_id=commander['id'], commander_name=commander['name'])
+        db.session.add(deck)
+        db.session.flush()
+        db.session.add(DeckCard(deck_id=deck.id, card_id=commander['id'], is_commander=True))
+        db.session.add_all(DeckCard(deck_id=deck.id, card_id=card['id']) for card in others)
+    db.session.commit()
+
+@pytest.fixture(scope='module')
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed_challenge(app)
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
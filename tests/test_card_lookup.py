@@ -0,0 +1,74 @@
+"""
+Card search and autocomplete are answered from the local cards table only
+once a bulk-data import has recorded that it holds the whole card pool;
+stale printings are refreshed by a background job.
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.database import upsert_printings
+from app.models import BulkImport, Job, Printing
+from app.scryfall_service import scryfall_service
+
+@pytest.fixture
+def scryfall_calls(monkeypatch):
+    calls = []
+
+    def search_cards(query, page=1, unique='cards'):
+        calls.append(query)
+        return {'data': [], 'has_more': False, 'total_cards': 0}
+
+    def autocomplete(query):
+        calls.append(query)
+        return ['Commander 30', 'Commander 3000']
+
+    monkeypatch.setattr(scryfall_service, 'search_cards', search_cards)
+    monkeypatch.setattr(scryfall_service, 'autocomplete', autocomplete)
+    return calls
+
+@pytest.fixture
+def load_bulk_data(app):
+    def load():
+        db.session.add(BulkImport(source='default-cards.json', card_count=3200))
+        db.session.commit()
+
+    yield load
+    BulkImport.query.delete()
+    db.session.commit()
+    app.extensions.pop('bulk_data_loaded', None)
+
+def test_search_uses_scryfall_until_bulk_data_is_loaded(client, scryfall_calls, load_bulk_data):
+    client.get('/api/cards/search?q=Commander')
+    assert scryfall_calls == ['Commander']
+
+    load_bulk_data()
+    results = client.get('/api/cards/search?q=Commander').get_json()
+    assert results['total_cards'] == 32
+    assert scryfall_calls == ['Commander']
+
+def test_autocomplete_tops_up_from_scryfall_until_bulk_data_is_loaded(client, scryfall_calls, load_bulk_data):
+    local = ['Commander 3', 'Commander 30', 'Commander 31']
+
+    suggestions = client.get('/api/cards/autocomplete?q=commander 3').get_json()['suggestions']
+    assert suggestions == local + ['Commander 3000']
+    assert scryfall_calls == ['commander 3']
+
+    load_bulk_data()
+    suggestions = client.get('/api/cards/autocomplete?q=commander 3').get_json()['suggestions']
+    assert suggestions == local
+    assert scryfall_calls == ['commander 3']
+
+def test_stale_printings_are_refreshed_by_a_job(client, monkeypatch):
+    printing = {'id': 'print-1', 'name': 'Card 4-4', 'set_code': 'old', 'released_at': '2020-01-01'}
+    upsert_printings([printing], datetime.utcnow() - timedelta(days=30))
+    db.session.commit()
+    monkeypatch.setattr(scryfall_service, 'get_all_printings',
+                        lambda name: [dict(printing, set_code='new')])
+
+    response = client.get('/api/cards/Card 4-4/printings')
+    assert [p['set_code'] for p in response.get_json()['printings']] == ['old']
+
+    job = Job.query.filter_by(kind='refresh_printings').one()
+    assert job.status == 'completed'
+    assert db.session.get(Printing, 'print-1').set_code == 'new'
@@ -0,0 +1,23 @@
+"""
+ETags of deck reads name one representation: each ?fields= selection has
+its own tag, shared by equivalent spellings of the same fieldset.
+"""
+
+import pytest
+
+@pytest.mark.parametrize('url', ['/api/decks', '/api/decks/4'])
+def test_sparse_fieldsets_have_their_own_etag(client, url):
+    full = client.get(url)
+    sparse = client.get(f'{url}?fields=id,name')
+    assert full.status_code == sparse.status_code == 200
+    assert sparse.headers['ETag'] != full.headers['ETag']
+
+    # A tag for the full payload doesn't validate the sparse one, and vice versa
+    response = client.get(f'{url}?fields=id,name', headers={'If-None-Match': full.headers['ETag']})
+    assert response.status_code == 200
+    response = client.get(url, headers={'If-None-Match': sparse.headers['ETag']})
+    assert response.status_code == 200
+
+    response = client.get(f'{url}?fields=name,%20id', headers={'If-None-Match': sparse.headers['ETag']})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == sparse.headers['ETag']
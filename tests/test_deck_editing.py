@@ -0,0 +1,33 @@
+"""
+Deck card edits are validated before anything is written: a rejected
+operation leaves the deck unchanged and readable.
+"""
+
+import pytest
+
+DECK_ID = 3
+CARD_ID = 'card-2-1'
+
+@pytest.mark.parametrize('quantity', ['abc', -5, 0, 1.5, True, None])
+def test_patch_rejects_bad_quantity(client, quantity):
+    response = client.patch(f'/api/decks/{DECK_ID}/cards', json={'operations': [
+        {'op': 'update', 'card_id': 'card-2-2', 'quantity': 1},
+        {'op': 'update', 'card_id': CARD_ID, 'quantity': quantity},
+    ]})
+
+    assert response.status_code == 400
+    assert response.get_json()['operation'] == 1
+
+    deck = client.get(f'/api/decks/{DECK_ID}').get_json()
+    assert deck['card_count'] == 100
+    assert deck['validation']['valid']
+
+@pytest.mark.parametrize('quantity', ['abc', -5])
+def test_put_and_post_reject_bad_quantity(client, quantity):
+    response = client.put(f'/api/decks/{DECK_ID}/cards/{CARD_ID}', json={'quantity': quantity})
+    assert response.status_code == 400
+
+    response = client.post(f'/api/decks/{DECK_ID}/cards', json={'card_id': 'card-2-1', 'quantity': quantity})
+    assert response.status_code == 400
+
+    assert client.get(f'/api/decks/{DECK_ID}/validate').get_json()['valid']
@@ -0,0 +1,97 @@
+"""
+Decklist import: exported decklists import back into the same deck, lines
+for the same card are merged, Commander and Sideboard sections are honored,
+and importing a list the deck already matches changes nothing.
+"""
+
+import pytest
+from app.decklist_import import DecklistEntry, parse_decklist
+from app.scryfall_service import scryfall_service
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    """Names missing locally are not found instead of being fetched from Scryfall."""
+    monkeypatch.setattr(scryfall_service, 'fetch_many', lambda endpoints: [None] * len(endpoints))
+
+def import_decklist(client, deck_id, decklist):
+    response = client.post(f'/api/decks/{deck_id}/import', json={'decklist': decklist})
+    assert response.status_code == 202
+    job = client.get(response.get_json()['status_url']).get_json()
+    assert job['status'] == 'completed', job['error']
+    return {result['line']: result['status'] for result in job['results']}
+
+def export_decklist(client, deck_id):
+    return client.get(f'/api/decks/{deck_id}/export').get_data(as_text=True)
+
+def test_parse_merges_duplicates_and_keeps_sections():
+    entries = parse_decklist(
+        "Commander:\n2 Commander 1\n\n"
+        "Deck:\n2 Sol Ring\n1x sol  ring\n// comment\nCommander 1\n\n"
+        "Sideboard:\n1 Sol Ring\n"
+    )
+    assert entries == [
+        DecklistEntry('Commander 1', 1, 'commander'),
+        DecklistEntry('Sol Ring', 3, 'deck'),
+        DecklistEntry('Sol Ring', 1, 'sideboard'),
+    ]
+
+def test_export_imports_back_into_the_deck(client):
+    deck_id = 8
+    exported = export_decklist(client, deck_id)
+
+    response = client.patch(f'/api/decks/{deck_id}/cards', json={'operations': [
+        {'op': 'remove', 'card_id': 'cmd-7'},
+        {'op': 'remove', 'card_id': 'card-7-1'},
+        {'op': 'update', 'card_id': 'card-7-3', 'quantity': 2},
+    ]})
+    assert response.status_code == 200
+    assert not response.get_json()['validation']['valid']
+
+    statuses = import_decklist(client, deck_id, exported)
+    assert statuses['Commander 7'] == 'added'
+    assert statuses['Card 7-1'] == 'added'
+    assert statuses['Card 7-3'] == 'updated'
+    assert statuses['Card 7-2'] == 'unchanged'
+    assert len(statuses) == 100
+
+    assert export_decklist(client, deck_id) == exported
+    assert client.get(f'/api/decks/{deck_id}/validate').get_json()['valid']
+
+def test_reimport_changes_nothing(client):
+    deck_id = 9
+    exported = export_decklist(client, deck_id)
+    revision = client.get(f'/api/decks/{deck_id}').get_json()['revision']
+
+    statuses = import_decklist(client, deck_id, exported)
+    assert set(statuses.values()) == {'unchanged'}
+    assert client.get(f'/api/decks/{deck_id}').get_json()['revision'] == revision
+    assert export_decklist(client, deck_id) == exported
+
+def test_import_merges_lines_and_honors_sections(client):
+    deck_id = 10
+    response = client.patch(f'/api/decks/{deck_id}/cards', json={'operations': [
+        {'op': 'remove', 'card_id': 'cmd-9'},
+    ]})
+    assert response.status_code == 200
+
+    statuses = import_decklist(client, deck_id, (
+        "Commander:\n1 Commander 9\n\n"
+        "Deck:\n1 Card 9-1\n1x card  9-1\n1 Missing Card\n\n"
+        "Sideboard:\n1 Card 0-5\n"
+    ))
+    assert statuses == {
+        'Commander 9': 'added',
+        'Card 9-1': 'updated',
+        'Missing Card': 'not_found',
+        'Card 0-5': 'skipped',
+    }
+
+    deck = client.get(f'/api/decks/{deck_id}').get_json()
+    assert deck['commander_id'] == 'cmd-9'
+    quantities = {card['card_id']: card['quantity'] for card in deck['cards']}
+    assert quantities['card-9-1'] == 2
+    assert 'card-0-5' not in quantities
+    assert deck['validation']['errors'] == [
+        'Deck must be exactly 100 cards (current: 101)',
+        'Card 9-1 appears 2 times (singleton format allows only 1 copy)',
+    ]
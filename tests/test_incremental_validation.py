@@ -0,0 +1,117 @@
+"""
+Incremental validation state follows the deck it was built for: edits are
+applied as deltas, and a deck recreated under a reused ID starts afresh.
+"""
+
+import logging
+from sqlalchemy import text
+from app import db
+from app.database import upsert_cards
+from app.models import Deck
+from app.deck_validator import RULES, Rule, RuleEngine, get_rule_tables
+from app.incremental_validator import DeckValidationState, incremental_validator
+from app.scryfall_service import scryfall_service
+
+DECK_ID = 5
+GREEN_DECK_ID = 6
+
+def _add_card(card_id, name, type_line, color_identity=()):
+    upsert_cards([scryfall_service.parse_card_data({
+        'id': card_id, 'name': name, 'type_line': type_line, 'cmc': 0,
+        'color_identity': list(color_identity), 'legalities': {'commander': 'legal'}
+    })])
+    db.session.commit()
+
+def test_patch_deltas_match_full_validation(client, caplog):
+    _add_card('lotus', 'Black Lotus', 'Artifact')
+    _add_card('bolt', 'Lightning Bolt', 'Instant', 'R')
+    _add_card('forest', 'Forest', 'Basic Land — Forest', 'G')
+    assert client.get(f'/api/decks/{GREEN_DECK_ID}/validate').get_json()['valid']
+    rebuilds = incremental_validator.stats()['rebuilds']
+
+    edits = [
+        [
+            {'op': 'add', 'card_id': 'lotus'},
+            {'op': 'add', 'card_id': 'bolt'},
+            {'op': 'add', 'card_id': 'forest', 'quantity': 3},
+            {'op': 'remove', 'card_id': 'card-5-1'},
+            {'op': 'update', 'card_id': 'card-5-2', 'quantity': 2},
+        ],
+        [
+            {'op': 'update', 'card_id': 'forest', 'quantity': 1},
+            {'op': 'remove', 'card_id': 'lotus'},
+            {'op': 'remove', 'card_id': 'cmd-5'},
+        ],
+        [
+            {'op': 'remove', 'card_id': 'bolt'},
+            {'op': 'remove', 'card_id': 'forest'},
+            {'op': 'update', 'card_id': 'card-5-2', 'quantity': 1},
+            {'op': 'add', 'card_id': 'cmd-5', 'is_commander': True},
+            {'op': 'add', 'card_id': 'card-5-1'},
+        ],
+    ]
+    error_counts = []
+    for operations in edits:
+        response = client.patch(f'/api/decks/{GREEN_DECK_ID}/cards', json={'operations': operations})
+        assert response.status_code == 200
+
+        with caplog.at_level(logging.WARNING):
+            full = incremental_validator.verify(db.session.get(Deck, GREEN_DECK_ID))
+        assert 'diverged' not in caplog.text
+        assert response.get_json()['validation'] == full
+        error_counts.append(len(full['errors']))
+
+    assert incremental_validator.stats()['rebuilds'] == rebuilds
+    assert error_counts == [4, 4, 0]
+
+def test_recreated_deck_is_not_validated_from_stale_state(client):
+    assert client.get(f'/api/decks/{DECK_ID}/validate').get_json()['valid']
+
+    # Another process deletes the deck and a new deck reuses its ID at revision 0
+    for statement in (
+        'DELETE FROM card_usage WHERE deck_id = :id',
+        'DELETE FROM deck_cards WHERE deck_id = :id',
+        'DELETE FROM decks WHERE id = :id',
+    ):
+        db.session.execute(text(statement), {'id': DECK_ID})
+    db.session.execute(text(
+        "INSERT INTO decks (id, name, color_identity, color_identity_mask, revision, created_at, updated_at) "
+        "VALUES (:id, 'Replacement', 'C', 0, 0, '2030-01-01 00:00:00', '2030-01-01 00:00:00')"
+    ), {'id': DECK_ID})
+    db.session.commit()
+    db.session.remove()
+
+    validation = client.get(f'/api/decks/{DECK_ID}/validate').get_json()
+    assert not validation['valid']
+    assert 'Deck must be exactly 100 cards (current: 0)' in validation['errors']
+
+class InstantLimitRule(Rule):
+    """A rule without delta hooks: at most 33 instants."""
+
+    def __init__(self, deck, tables):
+        super().__init__(deck, tables)
+        self.instants = 0
+
+    def visit(self, deck_card):
+        if 'Instant' in deck_card.card.type_line:
+            self.instants += deck_card.quantity
+
+    def finish(self, errors, warnings):
+        if self.instants > 33:
+            errors.append(f'Too many instants ({self.instants})')
+
+def test_rules_without_delta_hooks_are_rerun(app):
+    rules = RULES + [InstantLimitRule]
+    deck = db.session.get(Deck, 2)
+    state = DeckValidationState(deck, get_rule_tables(), rules)
+    for deck_card in deck.cards:
+        state.add(deck_card.id, deck_card.card, deck_card.quantity, deck_card.is_commander)
+    assert state.result() == RuleEngine(rules).validate(deck)
+
+    instant = deck.cards[1]
+    state.set_quantity(instant.id, 2)
+    assert state.result()['errors'] == [
+        'Deck must be exactly 100 cards (current: 101)',
+        f'{instant.card.name} appears 2 times (singleton format allows only 1 copy)',
+        'Too many instants (34)',
+    ]
@@ -0,0 +1,55 @@
+"""
+Deck read endpoints must stay within their SQL query budgets.
+TestingConfig sets QUERY_BUDGET_STRICT, so a view that exceeds its budget
+raises QueryBudgetExceeded and the request fails.
+"""
+
+import pytest
+from app.models import Deck
+from app.query_budget import QueryBudgetExceeded, QueryCounter, query_budget
+
+def test_get_decks(client):
+    response = client.get('/api/decks')
+
+    assert response.status_code == 200
+    decks = response.get_json()['decks']
+    assert len(decks) == 32
+    assert all(deck['card_count'] == 100 for deck in decks)
+
+@pytest.mark.parametrize('repeat', [1, 2])
+def test_get_deck(client, repeat):
+    # The second pass is served from the memoized validation
+    for deck_id in (1, 16, 32):
+        for _ in range(repeat):
+            response = client.get(f'/api/decks/{deck_id}')
+
+            assert response.status_code == 200
+            deck = response.get_json()
+            assert len(deck['cards']) == 100
+            assert deck['validation']['valid'], deck['validation']['errors']
+
+def test_challenge_status(client):
+    response = client.get('/api/challenge/status')
+
+    assert response.status_code == 200
+    status = response.get_json()
+    assert status['total_decks'] == 32
+    assert status['valid']
+
+def test_not_modified_costs_one_query(client):
+    etag = client.get('/api/decks/1').headers['ETag']
+
+    with QueryCounter() as counter:
+        response = client.get('/api/decks/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert counter.count == 1
+
+def test_budget_exceeded_fails(app, client):
+    @query_budget(1)
+    def two_queries():
+        Deck.query.first()
+        Deck.query.count()
+
+    with app.test_request_context(), pytest.raises(QueryBudgetExceeded):
+        two_queries()